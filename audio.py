@@ -0,0 +1,177 @@
+import os
+import queue
+import threading
+
+SOUND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Sound')
+SOUND_EXTENSIONS = ('.mp3', '.wav', '.ogg')
+
+
+class NullBackend:
+    """Silent backend for headless and test runs."""
+
+    def load(self, path):
+        return path
+
+    def play(self, clip):
+        return None
+
+    def stop(self, channel, clip=None):
+        pass
+
+    def stop_all(self):
+        pass
+
+
+class PygameBackend:
+    """Decodes each clip into memory once; the mixer plays clips on parallel channels."""
+
+    def __init__(self, channels=16):
+        import pygame
+
+        self._pygame = pygame
+        pygame.mixer.init()
+        pygame.mixer.set_num_channels(channels)
+
+    def load(self, path):
+        return self._pygame.mixer.Sound(path)
+
+    def play(self, clip):
+        return clip.play()
+
+    def stop(self, channel, clip=None):
+        # the mixer reuses channels, so leave one alone once it has moved on to another clip
+        if channel is not None and (clip is None or channel.get_sound() is clip):
+            channel.stop()
+
+    def stop_all(self):
+        self._pygame.mixer.stop()
+
+
+class PlaysoundBackend:
+    """Fallback for installs without pygame.
+
+    playsound cannot preload or stop a clip, so each clip is decoded when
+    played, on its own thread so that clips can overlap, and stop() only
+    works for clips that have not started yet.
+    """
+
+    def __init__(self):
+        from playsound import playsound
+
+        self._playsound = playsound
+
+    def load(self, path):
+        return path
+
+    def play(self, clip):
+        threading.Thread(target=self._playsound, args=(clip,), daemon=True).start()
+        return None
+
+    def stop(self, channel, clip=None):
+        pass
+
+    def stop_all(self):
+        pass
+
+
+def default_backend():
+    """Backend named by $GHOST_GAME_AUDIO (pygame, playsound or null), else the best available."""
+    choice = os.environ.get('GHOST_GAME_AUDIO', '').lower()
+    if choice == 'null':
+        return NullBackend()
+    candidates = {'pygame': [PygameBackend], 'playsound': [PlaysoundBackend]}.get(
+        choice, [PygameBackend, PlaysoundBackend])
+    for backend in candidates:
+        try:
+            return backend()
+        except Exception as err:
+            print(f"Audio backend {backend.__name__} unavailable: {err}")
+    return NullBackend()
+
+
+class Playback:
+    """Handle for one requested clip; cancel() stops it, or drops it if not started yet."""
+
+    def __init__(self, engine, name, generation):
+        self.engine = engine
+        self.name = name
+        self.generation = generation
+        self.channel = None
+        self.cancelled = False
+
+    def cancel(self):
+        engine = self.engine
+        with engine._lock:
+            self.cancelled = True
+            if self.channel is not None:
+                engine.backend.stop(self.channel, engine.clips.get(self.name))
+                # only once the stop is done, so the handle never points at a channel playing something else
+                self.channel = None
+
+
+class AudioEngine:
+    """Plays sound effects without ever blocking the game thread.
+
+    Every clip in sound_dir is loaded (decoded, for backends that can) once
+    when the engine starts. play() only queues a request; a background
+    worker starts the clip, and clips that overlap are mixed together.
+    Starting a clip, stop_all() and cancel() all take one lock, so a clip
+    the worker has already dequeued never starts after them.
+    """
+
+    def __init__(self, backend=None, sound_dir=SOUND_DIR):
+        self.backend = backend if backend is not None else default_backend()
+        self.clips = {}
+        for filename in sorted(os.listdir(sound_dir)):
+            name, ext = os.path.splitext(filename)
+            if ext.lower() in SOUND_EXTENSIONS:
+                try:
+                    self.clips[name] = self.backend.load(os.path.join(sound_dir, filename))
+                except Exception as err:
+                    print(f"Could not load sound {filename}: {err}")
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._requests = queue.SimpleQueue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        while True:
+            playback = self._requests.get()
+            if playback is None:
+                return
+            with self._lock:
+                if (playback.cancelled or playback.generation != self._generation
+                        or playback.name not in self.clips):
+                    continue
+                try:
+                    playback.channel = self.backend.play(self.clips[playback.name])
+                except Exception as err:
+                    print(f"Could not play sound {playback.name}: {err}")
+
+    def play(self, name):
+        """Queue the clip called name (its file name without extension) and return a Playback."""
+        playback = Playback(self, name, self._generation)
+        self._requests.put(playback)
+        return playback
+
+    def stop_all(self):
+        """Stop everything playing and drop requests the worker has not started yet."""
+        with self._lock:
+            self._generation += 1
+            self.backend.stop_all()
+
+    def close(self):
+        self.stop_all()
+        self._requests.put(None)
+
+
+_engine = None
+
+
+def get_engine():
+    """Process-wide engine, created (and the clips loaded) on first use."""
+    global _engine
+    if _engine is None:
+        _engine = AudioEngine()
+    return _engine
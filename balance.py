@@ -0,0 +1,197 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+from collections import Counter
+
+from engine import DIFFICULTIES, RESPAWN, RULES, GameEngine
+
+# Games a worker plays per task; big enough to amortise the round trip,
+# small enough to keep every core busy until the end.
+CHUNK = 200
+# A game still going after this many turns is stopped and counted as capped.
+MAX_TURNS = 1000
+# How far the Nightmare ghost searches. Here it has a fixed depth rather than
+# a time budget, so that its moves, and the report, do not depend on the machine.
+LOOKAHEAD_DEPTH = 4
+
+
+def random_policy(engine, rng):
+    """Any adjacent node."""
+    return rng.choice(engine.neighbors(engine.player_position))
+
+
+def flee_policy(engine, rng):
+    """The adjacent node farthest from the ghost, ties broken at random."""
+    moves = engine.neighbors(engine.player_position)
+    gaps = [engine.distance(move, engine.ghost_position) for move in moves]
+    best = max(gaps)
+    return rng.choice([move for move, gap in zip(moves, gaps) if gap == best])
+
+
+POLICIES = {'random': random_policy, 'flee': flee_policy}
+
+
+def parse_sweep(text):
+    """'name=v1,v2' -> (name, [v1, v2]); a value like 2-5 is a (low, high) pair."""
+    name, _, values = text.partition('=')
+    if name not in RULES._fields and name not in DIFFICULTIES[1]._fields[1:]:
+        raise ValueError(f"unknown parameter {name!r}")
+    parsed = []
+    for value in values.split(','):
+        if '-' in value[1:]:
+            low, high = value.split('-', 1)
+            parsed.append((int(low), int(high)))
+        else:
+            parsed.append(float(value) if '.' in value else int(value))
+    return name, parsed
+
+
+def configurations(difficulties, policies, sweeps):
+    """One dict per combination of difficulty, policy and swept values."""
+    names = [name for name, _ in sweeps]
+    for difficulty, policy in itertools.product(difficulties, policies):
+        for values in itertools.product(*(values for _, values in sweeps)):
+            yield {'difficulty': difficulty, 'policy': policy, 'params': dict(zip(names, values))}
+
+
+def _rules_for(config):
+    params = config['params']
+    rules = RULES._replace(**{name: value for name, value in params.items() if name in RULES._fields})
+    difficulty = DIFFICULTIES[config['difficulty']]
+    difficulty = difficulty._replace(**{name: value for name, value in params.items()
+                                        if name in difficulty._fields})
+    difficulties = dict(DIFFICULTIES)
+    difficulties[config['difficulty']] = difficulty
+    return rules, difficulties
+
+
+# One engine per map and process, so the routing tables of each map are
+# built once however many games are played on it.
+_engines = {}
+
+
+def _engine_for(map_seed, map_size, map_radius):
+    key = (map_seed, map_size, map_radius)
+    if key not in _engines:
+        engine = GameEngine.generate(map_size, map_radius, map_seed)
+        engine.lookahead_budget, engine.lookahead_depth = None, LOOKAHEAD_DEPTH
+        _engines[key] = engine
+    return _engines[key]
+
+
+def play_games(task):
+    """Play the games first..first+count of one configuration; returns (index, tallies)."""
+    index, config, first, count, options = task
+    rules, difficulties = _rules_for(config)
+    policy = POLICIES[config['policy']]
+    turns, scores, endings = Counter(), Counter(), Counter()
+    respawns = 0
+    for game in range(first, first + count):
+        # every game is seeded by its own number, so the results do not depend on how the work was split
+        game_seed = f"{options['seed']}:{index}:{game}"
+        map_seed = options['map_seeds'][game % len(options['map_seeds'])]
+        engine = _engine_for(map_seed, options['map_size'], options['map_radius'])
+        engine.rules, engine.difficulties = rules, difficulties
+        engine.rng.seed(game_seed)
+        engine.reset(config['difficulty'], options['hearts_of_dead'])
+        rng = random.Random(game_seed + ':policy')
+        turn = 0
+        while not engine.done and turn < options['max_turns']:
+            if engine.caught:
+                engine.step(RESPAWN)
+                respawns += 1
+                continue
+            observation = engine.step(policy(engine, rng))
+            turn += 1
+        if not engine.done:
+            endings['capped'] += 1
+        elif 'caught' in observation.events:
+            endings['caught'] += 1
+        else:
+            endings['sanity'] += 1
+        turns[turn] += 1
+        scores[engine.current_score] += 1
+    return index, {'turns': turns, 'scores': scores, 'endings': endings, 'respawns': respawns}
+
+
+def summarize(histogram):
+    """Mean and percentiles of a Counter of value -> games."""
+    total = sum(histogram.values())
+    if not total:
+        return {}
+    values = sorted(histogram)
+    summary = {'mean': round(sum(value * n for value, n in histogram.items()) / total, 3)}
+    cumulative = 0
+    wanted = [('p10', 0.1), ('p50', 0.5), ('p90', 0.9)]
+    for value in values:
+        cumulative += histogram[value]
+        while wanted and cumulative >= wanted[0][1] * total:
+            summary[wanted.pop(0)[0]] = value
+    summary['min'], summary['max'] = values[0], values[-1]
+    return summary
+
+
+def run(games=1000, difficulties=(1, 2, 3), policies=('random', 'flee'), sweeps=(), seed=0, workers=None,
+        maps=16, map_size=24, map_radius=0.2, hearts_of_dead=0, max_turns=MAX_TURNS, chunk=CHUNK):
+    """Play games seeded games for every configuration and return the merged report.
+
+    The same arguments give the same report whatever the number of workers.
+    """
+    configs = list(configurations(difficulties, policies, sweeps))
+    map_seeds = [random.Random(f"{seed}:map:{i}").randrange(2**32) for i in range(maps)]
+    options = {'seed': seed, 'map_seeds': map_seeds, 'map_size': map_size, 'map_radius': map_radius,
+               'hearts_of_dead': hearts_of_dead, 'max_turns': max_turns}
+    tasks = [(index, config, first, min(chunk, games - first), options)
+             for index, config in enumerate(configs) for first in range(0, games, chunk)]
+    merged = [{'turns': Counter(), 'scores': Counter(), 'endings': Counter(), 'respawns': 0} for _ in configs]
+    with multiprocessing.Pool(workers or os.cpu_count()) as pool:
+        for index, tallies in pool.imap_unordered(play_games, tasks):
+            totals = merged[index]
+            for key in ('turns', 'scores', 'endings'):
+                totals[key].update(tallies[key])
+            totals['respawns'] += tallies['respawns']
+
+    results = []
+    for config, totals in zip(configs, merged):
+        results.append(dict(config, games=games,
+                            survival_turns=summarize(totals['turns']),
+                            score=summarize(totals['scores']),
+                            endings={ending: round(totals['endings'][ending] / games, 4)
+                                     for ending in ('caught', 'sanity', 'capped')},
+                            respawns_per_game=round(totals['respawns'] / games, 4)))
+    return {'seed': seed, 'games_per_config': games, 'maps': maps, 'map_size': map_size,
+            'max_turns': max_turns, 'results': results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play seeded games in parallel to see how the difficulty settings play out")
+    parser.add_argument("--games", type=int, default=1000, help="games per configuration")
+    parser.add_argument("--difficulty", type=int, nargs="+", default=sorted(DIFFICULTIES),
+                        choices=sorted(DIFFICULTIES))
+    parser.add_argument("--policy", nargs="+", default=sorted(POLICIES), choices=sorted(POLICIES))
+    parser.add_argument("--sweep", action="append", default=[], metavar="NAME=V1,V2",
+                        help="rule or difficulty value to vary, e.g. booster_chance=30,45,60 or hunt_turns=2-5,3-6")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per core)")
+    parser.add_argument("--maps", type=int, default=16, help="distinct maps the games are spread over")
+    parser.add_argument("--map-size", type=int, default=24)
+    parser.add_argument("--map-radius", type=float, default=0.2)
+    parser.add_argument("--hearts", type=int, default=0, help="Hearts of the Dead at the start of each game")
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--output", default=None, help="write the report here instead of to stdout")
+    args = parser.parse_args()
+    try:
+        sweeps = [parse_sweep(text) for text in args.sweep]
+    except ValueError as err:
+        parser.error(str(err))
+    report = run(args.games, args.difficulty, args.policy, sweeps, args.seed, args.workers, args.maps,
+                 args.map_size, args.map_radius, args.hearts, args.max_turns)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(text + "\n")
+    else:
+        print(text)
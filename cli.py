@@ -1,6 +1,12 @@
 import socket
 import threading
-import os
+from collections import deque
+
+from protocol import EXIT, MOVE, NAME, TEXT, FrameReader, WorldView, decode, pack_frame
+from screen import TerminalScreen
+
+# Server messages kept on screen under the grid during a game.
+MESSAGE_LINES = 10
 
 def start_client():
     client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -10,47 +16,66 @@ def start_client():
         print(f"Unable to connect to the server: {e}")
         return
 
+    screen = TerminalScreen()
+
     def receive_data():
+        world = WorldView()
+        reader = FrameReader()
+        messages = deque(maxlen=MESSAGE_LINES)
         while True:
             try:
-                data = client.recv(4096).decode()
-                if not data:
-                    print("Disconnected from the server.")
+                frames = reader.recv(client)
+                if frames is None:
+                    screen.write("Disconnected from the server.")
                     break
-                os.system("cls" if os.name == "nt" else "clear") 
-                print(data)
+                redraw = False
+                for frame_type, payload in frames:
+                    message = decode(frame_type, payload)
+                    if message["t"] != TEXT:
+                        world.apply(message)
+                        redraw = world.synced
+                    elif world.synced:
+                        messages.extend(line for line in message["text"].split("\n") if line)
+                        redraw = True
+                    else:
+                        screen.write(message["text"])
+                # several updates can arrive together; draw only the latest state
+                if redraw:
+                    screen.draw(world.render() + "\n" + "\n".join(messages))
             except Exception as e:
-                print(f"Error receiving data: {e}")
+                screen.write(f"Error receiving data: {e}")
                 break
 
     threading.Thread(target=receive_data, daemon=True).start()
     
     try:
-        name = input("Enter your name: ").strip()
+        name = screen.prompt("Enter your name: ").strip()
         if not name:
             name = "Player"
-        client.sendall(name.encode())  
+        client.sendall(pack_frame(NAME, name.encode()))
 
-        print(f"Your name representation in the game: {name[0].upper()}")
+        screen.write(f"Your name representation in the game: {name[0].upper()}")
     except Exception as e:
-        print(f"Error sending name: {e}")
+        screen.write(f"Error sending name: {e}")
         return
     
 
     while True:
         try:
-            move = input("Move (W/A/S/D or EXIT to quit): ").strip().upper()
-            if move in ["W", "A", "S", "D", "EXIT"]:
-                client.sendall(move.encode())
-                if move == "EXIT":
-                    print("You have exited the game.")
-                    break
+            move = screen.prompt("Move (W/A/S/D or EXIT to quit): ").strip().upper()
+            if move in ["W", "A", "S", "D"]:
+                client.sendall(pack_frame(MOVE, move.encode()))
+            elif move == "EXIT":
+                client.sendall(pack_frame(EXIT))
+                screen.write("You have exited the game.")
+                break
             else:
-                print("Invalid move! Use W, A, S, D, or EXIT.")
+                screen.write("Invalid move! Use W, A, S, D, or EXIT.")
         except Exception as e:
-            print(f"Error sending data: {e}")
+            screen.write(f"Error sending data: {e}")
             break
 
+    screen.close()
     client.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+import numpy as np
+
+INF = np.iinfo(np.int32).max
+
+# King moves, as the ghost has always moved; orthogonal steps first so
+# that ties go to them.
+STEPS = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+class DistanceField:
+    """Steps from every cell to the nearest of a set of source cells, kept up to date.
+
+    dist holds the number of ghost moves (8-connected, no cutting past a
+    wall's corner) from each cell to the closest source, and owner which
+    source that is. update() only recomputes what its changes affect:
+    the cells owned by a source that moved or disappeared are cleared and
+    flooded again from the edge of the cleared area, together with the
+    sources' new cells. Each flood level is expanded with array operations.
+    Distances beyond horizon are left at INF, which bounds the work on
+    very large grids. Walls never move, so which of the eight moves is
+    legal from each cell is worked out once, up front.
+    """
+
+    def __init__(self, walls, horizon=None):
+        self.shape = walls.shape
+        rows, cols = walls.shape
+        self.cols = cols
+        self.offsets = np.array([d_row * cols + d_col for d_row, d_col in STEPS], dtype=np.int64)
+        self.legal = _legal_moves(walls)
+        self.horizon = horizon
+        self.dist = np.full(rows * cols, INF, dtype=np.int32)
+        self.owner = np.full(rows * cols, -1, dtype=np.int32)
+        # scratch space for dropping repeated cells from a frontier
+        self._seen = np.zeros(rows * cols, dtype=np.int64)
+        self.sources = {}
+        self.updated_cells = 0
+
+    def _neighbors(self, cells):
+        """(neighbour, cell) index pairs for every legal move out of cells."""
+        index, step = np.nonzero(self.legal[cells])
+        src = cells[index]
+        return src + self.offsets[step], src
+
+    def _distinct(self, cells):
+        """cells without repeats (the order is not kept)."""
+        positions = np.arange(len(cells))
+        self._seen[cells] = positions
+        return cells[self._seen[cells] == positions]
+
+    def update(self, sources):
+        """Make the field match sources, a dict of source id -> flat cell index."""
+        if sources == self.sources:
+            return
+        stale = [key for key, cell in self.sources.items() if sources.get(key) != cell]
+        boundary = np.empty(0, dtype=np.int64)
+        if stale:
+            cleared = np.flatnonzero(np.isin(self.owner, stale))
+            self.dist[cleared] = INF
+            self.owner[cleared] = -1
+            if cleared.size:
+                nb, _ = self._neighbors(cleared)
+                boundary = np.unique(nb[self.dist[nb] != INF])
+        cells = np.fromiter(sources.values(), dtype=np.int64, count=len(sources))
+        keys = np.fromiter(sources.keys(), dtype=np.int32, count=len(sources))
+        seeds = np.concatenate([cells, boundary])
+        seed_dist = np.concatenate([np.zeros(len(cells), dtype=np.int32), self.dist[boundary]])
+        seed_owner = np.concatenate([keys, self.owner[boundary]])
+        self.sources = dict(sources)
+        self.updated_cells = self._flood(seeds, seed_dist, seed_owner)
+
+    def _flood(self, seeds, seed_dist, seed_owner):
+        dist, owner = self.dist, self.owner
+        order = np.argsort(seed_dist, kind="stable")
+        seeds, seed_dist, seed_owner = seeds[order], seed_dist[order], seed_owner[order]
+        horizon = self.horizon if self.horizon is not None else INF - 1
+        frontier = np.empty(0, dtype=np.int64)
+        level = int(seed_dist[0]) if len(seeds) else 0
+        taken = 0
+        updated = 0
+        while True:
+            end = int(np.searchsorted(seed_dist, level, side="right")) if taken < len(seeds) else taken
+            if end > taken:
+                cells, owners = seeds[taken:end], seed_owner[taken:end]
+                better = dist[cells] > level
+                dist[cells[better]] = level
+                owner[cells[better]] = owners[better]
+                frontier = self._distinct(np.concatenate([frontier, cells[dist[cells] == level]]))
+                taken = end
+            if frontier.size == 0:
+                if taken >= len(seeds):
+                    break
+                level = int(seed_dist[taken])
+                continue
+            if level >= horizon:
+                break
+            nb, src = self._neighbors(frontier)
+            better = dist[nb] > level + 1
+            nb, src = nb[better], src[better]
+            dist[nb] = level + 1
+            owner[nb] = owner[src]
+            frontier = self._distinct(nb)
+            updated += frontier.size
+            level += 1
+        return updated
+
+    def next_cells(self, cells):
+        """Best next cell for a mover at each of cells: the neighbour closest to a source.
+
+        A cell stays put if no neighbour is closer, including when it is
+        already on a source or out of the field's reach; reached tells the
+        two apart (False where the field has no distance for the cell).
+        """
+        legal = self.legal[cells]
+        nb = np.where(legal, cells[:, None] + self.offsets, cells[:, None])
+        d = np.where(legal, self.dist[nb], INF)
+        k = d.argmin(axis=1)
+        picks = np.arange(len(cells))
+        best = d[picks, k]
+        here = self.dist[cells]
+        closer = best < here
+        target = np.where(closer, nb[picks, k], cells)
+        reached = np.minimum(best, here) != INF
+        return target, reached
+
+
+def _legal_moves(walls):
+    """(rows * cols, 8) table: whether each of STEPS is allowed from each cell."""
+    rows, cols = walls.shape
+    free = np.pad(~walls, 1, constant_values=False)
+    legal = np.empty((rows, cols, len(STEPS)), dtype=bool)
+    for k, (d_row, d_col) in enumerate(STEPS):
+        ok = free[1 + d_row:1 + d_row + rows, 1 + d_col:1 + d_col + cols].copy()
+        if d_row and d_col:
+            # no squeezing diagonally between two walls
+            ok &= free[1 + d_row:1 + d_row + rows, 1:1 + cols]
+            ok &= free[1:1 + rows, 1 + d_col:1 + d_col + cols]
+        legal[:, :, k] = ok
+    return legal.reshape(rows * cols, len(STEPS))
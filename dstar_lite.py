@@ -0,0 +1,145 @@
+import math
+from heapq import heappush, heappop, heapreplace
+
+INF = math.inf
+
+
+class DStarLite:
+    """Incremental D* Lite planner for a ghost chasing a moving player.
+
+    The search grows backwards from the player (the goal) towards the ghost
+    (the start) and keeps its g/rhs values and open list between turns.
+    The ghost stepping along its path only bumps the key modifier km, which
+    costs nothing; the player moving is treated like a change to the cost
+    of reaching the goal (the old goal loses rhs = 0, the new one gains
+    it), and edge weight changes such as doors opening and closing repair
+    only the nodes whose distances they affect.
+
+    heuristic(a, b) must be a lower bound on the distance between a and b
+    for every weight the edges will ever have, e.g. the map's Euclidean
+    heuristic as long as weights only rise above their lengths. expanded
+    is the number of nodes processed by the latest replan.
+    """
+
+    def __init__(self, graph, heuristic=None):
+        self.graph = graph
+        self.heuristic = heuristic
+        self._indptr, self._indices, self._weights = graph.adjacency()
+        self.expanded = 0
+        self.total_expanded = 0
+        self.reset()
+
+    def reset(self):
+        """Forget the search tree; the next replan starts from scratch."""
+        n = self.graph.n
+        self.g = [INF] * n
+        self.rhs = [INF] * n
+        self._queued = [None] * n
+        self._heap = []
+        self.start = None
+        self.goal = None
+        self._last = None
+        self.km = 0.0
+
+    def _h(self, s):
+        return self.heuristic(s, self.start) if self.heuristic else 0.0
+
+    def _key(self, s):
+        m = min(self.g[s], self.rhs[s])
+        return (m + self._h(s) + self.km, m)
+
+    def _update_vertex(self, u):
+        g, rhs = self.g, self.rhs
+        if u != self.goal:
+            indices, weights = self._indices, self._weights
+            best = INF
+            for k in range(self._indptr[u], self._indptr[u + 1]):
+                cost = weights[k] + g[indices[k]]
+                if cost < best:
+                    best = cost
+            rhs[u] = best
+        if g[u] != rhs[u]:
+            key = self._key(u)
+            self._queued[u] = key
+            heappush(self._heap, (key, u))
+        else:
+            self._queued[u] = None
+
+    def _top(self):
+        heap, queued = self._heap, self._queued
+        while heap:
+            key, u = heap[0]
+            if queued[u] == key:
+                return key, u
+            heappop(heap)
+        return None, None
+
+    def _compute_shortest_path(self):
+        g, rhs, heap, queued = self.g, self.rhs, self._heap, self._queued
+        indptr, indices = self._indptr, self._indices
+        start = self.start
+        expanded = 0
+        while True:
+            key, u = self._top()
+            if u is None or (key >= self._key(start) and rhs[start] == g[start]):
+                break
+            new_key = self._key(u)
+            if key < new_key:
+                queued[u] = new_key
+                heapreplace(heap, (new_key, u))
+                continue
+            heappop(heap)
+            queued[u] = None
+            expanded += 1
+            if g[u] > rhs[u]:
+                g[u] = rhs[u]
+            else:
+                g[u] = INF
+                self._update_vertex(u)
+            for k in range(indptr[u], indptr[u + 1]):
+                self._update_vertex(indices[k])
+        self.expanded = expanded
+        self.total_expanded += expanded
+
+    def update_edge(self, u, v, weight):
+        """Change the weight of edge (u, v); the next replan repairs what it affects."""
+        self.graph.set_edge_weight(u, v, weight)
+        if self.goal is not None:
+            self._update_vertex(u)
+            self._update_vertex(v)
+
+    def _is_neighbor(self, u, v):
+        indices = self._indices
+        return any(indices[k] == v for k in range(self._indptr[u], self._indptr[u + 1]))
+
+    def next_hop(self, start, goal):
+        """Replan for the ghost at start chasing the player at goal; return the ghost's next node."""
+        if self.goal is not None and goal != self.goal and not self._is_neighbor(self.goal, goal):
+            # a respawn invalidates nearly every g value, so repairing would
+            # cost more than searching again
+            self.reset()
+        if self.goal is None:
+            self.start = self._last = start
+            self.goal = goal
+            self.rhs[goal] = 0.0
+            self._update_vertex(goal)
+        else:
+            if start != self.start:
+                self.start = start
+                self.km += self.heuristic(self._last, start) if self.heuristic else 0.0
+                self._last = start
+            if goal != self.goal:
+                old_goal, self.goal = self.goal, goal
+                self._update_vertex(old_goal)
+                self.rhs[goal] = 0.0
+                self._update_vertex(goal)
+        self._compute_shortest_path()
+
+        if start == goal:
+            return start
+        best, hop = INF, start
+        for k in range(self._indptr[start], self._indptr[start + 1]):
+            cost = self._weights[k] + self.g[self._indices[k]]
+            if cost < best:
+                best, hop = cost, self._indices[k]
+        return hop
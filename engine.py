@@ -0,0 +1,344 @@
+import random
+from collections import namedtuple
+
+import numpy as np
+
+from dstar_lite import DStarLite
+from heuristics import EuclideanHeuristic, LandmarkHeuristic
+from lookahead import ExpectimaxGhost
+from mapgen import generate_map
+from pathfinding import BFSWorkspace, dijkstra, astar
+from routing import RoutingTable
+
+# Above this many nodes the O(n^2) routing tables are skipped and the ghost
+# searches the CSR graph directly on every move.
+ROUTING_TABLE_MAX_NODES = 1000
+
+# Per difficulty: starting sanity, sanity after a respawn, sanity lost on
+# every move, and the chance that the calm ghost takes a step.
+Difficulty = namedtuple('Difficulty', ['name', 'sanity', 'respawn_sanity', 'sanity_loss', 'ghost_move_chance'])
+
+DIFFICULTIES = {
+    1: Difficulty('Easy', 100, 50, 8, 0.6),
+    2: Difficulty('Medium', 70, 35, 10, 0.8),
+    3: Difficulty('Hard', 50, 25, 12, 1.0),
+    # Hard's numbers, with a ghost that searches ahead instead of following the shortest path
+    4: Difficulty('Nightmare', 50, 25, 12, 1.0),
+}
+
+# Rules shared by every difficulty. The ghost starts hunting after
+# hunt_after calm moves and hunts for a random number of turns in
+# hunt_turns, costing hunt_sanity_loss more sanity per move; being closer
+# than proximity_range hops costs proximity_penalty per hop. Each move
+# scores move_score. Booster tablets and Hearts of the Dead are found with
+# the given percentage chances.
+Rules = namedtuple('Rules', ['hunt_after', 'hunt_turns', 'hunt_sanity_loss', 'proximity_range',
+                             'proximity_penalty', 'move_score', 'booster_chance', 'booster_sanity',
+                             'heart_chance', 'ghost_spawn_distance'])
+
+RULES = Rules(hunt_after=5, hunt_turns=(2, 5), hunt_sanity_loss=6, proximity_range=5,
+              proximity_penalty=2, move_score=10, booster_chance=45, booster_sanity=20,
+              heart_chance=10, ghost_spawn_distance=4)
+
+# Actions once the ghost has caught a player who still has a Heart of the Dead.
+RESPAWN = 'respawn'
+GIVE_UP = 'give_up'
+
+# What step() returns. events lists what happened during the turn, in
+# order: 'invalid_move', 'booster', 'heart', 'hunt', 'hunt_over', 'caught',
+# 'respawned'. caught means the game waits for RESPAWN or GIVE_UP.
+Observation = namedtuple('Observation', ['player', 'ghost', 'sanity', 'score', 'hearts_of_dead',
+                                         'ghost_hunt', 'caught', 'done', 'events'])
+
+
+class GameEngine:
+    """The rules of the single-player game, with no drawing, sound or input.
+
+    A turn is step(node): the player moves to an adjacent node (numbered
+    from 1, as on screen), may find a power-up, the ghost moves, and
+    sanity and score are updated. All randomness comes from one
+    random.Random, so a seed replays a game exactly. Game in final2.py is
+    a front end over this; bots and tuning scripts drive it directly.
+    """
+
+    # Hard-mode A* heuristic on maps too large for the routing tables:
+    # 'landmarks' (ALT), 'euclidean' or None for plain Dijkstra ordering.
+    astar_heuristic = 'landmarks'
+    # Seconds the Nightmare ghost may think per move. None searches to
+    # lookahead_depth every time instead, which makes games reproducible.
+    lookahead_budget = 0.02
+    lookahead_depth = 32
+
+    def __init__(self, graph, difficulty=1, hearts_of_dead=0, seed=None, rules=RULES, difficulties=DIFFICULTIES,
+                 pos=None, map_seed=None):
+        self.rng = random.Random(seed)
+        self.rules = rules
+        self.difficulties = difficulties
+        self.pos = pos
+        self.map_seed = map_seed
+        self.last_search = None
+        self.set_graph(graph)
+        self.reset(difficulty, hearts_of_dead)
+
+    @classmethod
+    def generate(cls, map_size=24, map_radius=0.2, map_seed=None, **options):
+        """Engine on a freshly generated map; options as for the constructor."""
+        pos, graph = generate_map(map_size, map_radius, map_seed)
+        return cls(graph, pos=pos, map_seed=map_seed, **options)
+
+    def set_graph(self, graph):
+        self.graph = graph
+        self.map_size = graph.n
+        self._open_graph = None
+        self._neighbors = None
+        self._routes = None
+        self._heuristic = None
+        self._bfs = None
+        self._planner = None
+        self._lookahead = None
+
+    @property
+    def open_graph(self):
+        """The map without its closed doors, which the player's moves and all hop counts go by."""
+        if self._open_graph is None:
+            self._open_graph = self.graph.open_edges()
+        return self._open_graph
+
+    @property
+    def routes(self):
+        """Routing tables for the current map, or None if the map is too large for them."""
+        if self._routes is None and self.graph.n <= ROUTING_TABLE_MAX_NODES:
+            self._routes = RoutingTable(self.open_graph)
+        return self._routes
+
+    @property
+    def bfs(self):
+        """Reusable BFS scratch space for the current map."""
+        if self._bfs is None:
+            self._bfs = BFSWorkspace(self.open_graph)
+        return self._bfs
+
+    @property
+    def heuristic(self):
+        """A* heuristic for the current map, built once per map."""
+        if self._heuristic is None:
+            if self.astar_heuristic == 'euclidean':
+                self._heuristic = EuclideanHeuristic(self.pos)
+            elif self.astar_heuristic == 'landmarks':
+                self._heuristic = LandmarkHeuristic(self.graph, seed=self.map_seed)
+        return self._heuristic
+
+    @property
+    def planner(self):
+        """Incremental D* Lite planner the weighted-mode ghost keeps between turns."""
+        if self._planner is None:
+            self._planner = DStarLite(self.graph, self.heuristic)
+        return self._planner
+
+    @property
+    def lookahead(self):
+        """Nightmare ghost's expectimax search, whose stats() describe its latest move."""
+        if self._lookahead is None:
+            neighbors = [[v-1 for v in self.neighbors(u+1)] for u in range(self.graph.n)]
+            # a player shut off by closed doors counts as farther away than any path
+            hops = self.routes.hops.copy()
+            hops[hops < 0] = self.graph.n
+            self._lookahead = ExpectimaxGhost(hops, neighbors, self.lookahead_budget,
+                                              self.lookahead_depth)
+        return self._lookahead
+
+    def set_edge_weight(self, pos1, pos2, weight):
+        """Change the cost of an edge during a game, e.g. float('inf') to close a door.
+
+        The ghost's planner repairs only what the change affects; the routing
+        tables, neighbour lists and hop searches are rebuilt on the next
+        lookup, so nobody walks or counts hops through a closed door. Weights
+        should not drop below the edge's length or the A* heuristics stop
+        being lower bounds.
+        """
+        self.planner.update_edge(pos1-1, pos2-1, weight)
+        self._open_graph = None
+        self._neighbors = None
+        self._routes = None
+        self._bfs = None
+        self._lookahead = None
+
+    def distance(self, pos1, pos2):
+        """Hops between two nodes."""
+        if self.routes is not None:
+            return self.routes.hop_distance(pos1-1, pos2-1)
+        return self.bfs.first_hop(pos1-1, pos2-1).cost
+
+    def neighbors(self, position):
+        if self._neighbors is None:
+            indptr, indices = self.open_graph.indptr.tolist(), self.open_graph.indices.tolist()
+            self._neighbors = [[v+1 for v in indices[indptr[u]:indptr[u+1]]] for u in range(self.graph.n)]
+        return self._neighbors[position-1]
+
+    def legal_actions(self):
+        if self.caught:
+            return [RESPAWN, GIVE_UP] if self.hearts_of_dead > 0 else [GIVE_UP]
+        return [] if self.done else self.neighbors(self.player_position)
+
+    def bfs_pathfinding(self, start, goal):
+        if self.routes is not None:
+            return self.routes.next_hop(start-1, goal-1) + 1
+        self.last_search = self.bfs.first_hop(start-1, goal-1)
+        hop = self.last_search.node
+        return start if hop is None else hop+1
+
+    def dijkstra_pathfinding(self, start, goal):
+        if self.routes is not None:
+            return self.routes.next_hop(start-1, goal-1, weighted=True) + 1
+        self.last_search = dijkstra(self.graph, start-1, goal-1)
+        path = self.last_search.path
+        return path[1]+1 if path and len(path) > 1 else start
+
+    def astar_pathfinding(self, start, goal):
+        # with an admissible heuristic A* still finds a shortest path, so small maps use the weighted table
+        if self.routes is not None:
+            return self.routes.next_hop(start-1, goal-1, weighted=True) + 1
+        # last_search.expanded shows how much of the map the heuristic let A* skip
+        self.last_search = astar(self.graph, start-1, goal-1, self.heuristic)
+        path = self.last_search.path
+        # graph is zero indexed , while start and goal might be 1
+        return path[1]+1 if path and len(path) > 1 else start
+
+    def select_pathfinding(self, start, goal):
+        """Selects the appropriate pathfinding algorithm based on difficulty."""
+        if self.difficulty in (2, 3, 4) and self.routes is None:
+            # on large maps the chasing ghost repairs its previous search instead of starting over;
+            # without the hop-distance matrix the Nightmare ghost has nothing to search with either
+            return self.planner.next_hop(start-1, goal-1) + 1
+        if self.difficulty == 1:
+            return self.bfs_pathfinding(start, goal)
+        elif self.difficulty == 2:
+            return self.dijkstra_pathfinding(start, goal)
+        elif self.difficulty == 3:
+            return self.astar_pathfinding(start, goal)
+        elif self.difficulty == 4:
+            return self.lookahead.next_move(start-1, goal-1) + 1
+        return start
+
+    def reset(self, difficulty=None, hearts_of_dead=None):
+        """Start a new game; difficulty and hearts_of_dead default to the current ones."""
+        if difficulty is not None:
+            if difficulty not in self.difficulties:
+                raise ValueError(f"difficulty must be one of {sorted(self.difficulties)}, not {difficulty!r}")
+            self.difficulty = difficulty
+        if hearts_of_dead is not None:
+            self.hearts_of_dead = hearts_of_dead
+        self.sanity = self.difficulties[self.difficulty].sanity
+        self.current_score = 0
+        self.turn = 0
+        self.player_position = self.rng.randint(1, self.map_size)
+        self.ghost_position = self.get_distant_ghost_position()
+        self.ghost_hunt = False
+        self.hunt_duration = 0
+        self.ghost_move_counter = 0
+        self.caught = False
+        self.done = False
+        if self._planner is not None:
+            # a new game owes nothing to the last one's searches
+            self._planner.reset()
+        return self.observe(())
+
+    def get_distant_ghost_position(self):
+        """A node at least ghost_spawn_distance hops from the player, chosen uniformly.
+
+        If no node is that far, one of the farthest nodes instead, as in
+        VecGameEnv's spawn table.
+        """
+        player = self.player_position - 1
+        hops = self.routes.hops[player] if self.routes is not None else self.bfs.hop_distances(player)
+        # unreachable nodes (-1) count as infinitely far, as in distance()
+        hops = np.where(hops < 0, np.iinfo(np.int32).max, hops)
+        far = np.flatnonzero(hops >= self.rules.ghost_spawn_distance)
+        if len(far) == 0:
+            far = np.flatnonzero(hops == hops.max())
+        return int(far[self.rng.randrange(len(far))]) + 1
+
+    def observe(self, events):
+        return Observation(self.player_position, self.ghost_position, self.sanity, self.current_score,
+                           self.hearts_of_dead, self.ghost_hunt, self.caught, self.done, tuple(events))
+
+    def step(self, action):
+        """Play one turn and return the Observation after it.
+
+        action is the node to move to, or RESPAWN or GIVE_UP after a catch.
+        A node that is not adjacent leaves the game as it was and is
+        reported as an 'invalid_move' event.
+        """
+        if self.done:
+            raise ValueError("the game is over; call reset() to start another")
+        events = []
+        if self.caught:
+            if action == RESPAWN and self.hearts_of_dead > 0:
+                self.respawn()
+                events.append('respawned')
+            elif action == GIVE_UP:
+                self.caught = False
+                self.done = True
+            else:
+                raise ValueError(f"after a catch the action must be {RESPAWN!r} or {GIVE_UP!r}, not {action!r}")
+            return self.observe(events)
+        if action not in self.neighbors(self.player_position):
+            return self.observe(['invalid_move'])
+
+        rules = self.rules
+        self.turn += 1
+        self.player_position = action
+        self.collect_powerup(events)
+        self.move_ghost(events)
+
+        distance_to_ghost = self.distance(self.player_position, self.ghost_position)
+        proximity_penalty = max(0, (rules.proximity_range - distance_to_ghost) * rules.proximity_penalty)
+        self.sanity -= self.difficulties[self.difficulty].sanity_loss + proximity_penalty
+        if self.ghost_hunt:
+            self.sanity -= rules.hunt_sanity_loss
+        self.current_score += rules.move_score
+
+        if self.player_position == self.ghost_position:
+            events.append('caught')
+            if self.hearts_of_dead > 0:
+                self.caught = True
+            else:
+                self.done = True
+        elif self.sanity <= 0:
+            self.done = True
+        return self.observe(events)
+
+    def respawn(self):
+        self.hearts_of_dead -= 1
+        self.sanity = self.difficulties[self.difficulty].respawn_sanity
+        self.player_position = self.rng.randint(1, self.map_size)
+        self.ghost_position = self.get_distant_ghost_position()
+        self.caught = False
+
+    def collect_powerup(self, events):
+        rules = self.rules
+        if self.rng.randint(1, 100) <= rules.booster_chance:
+            self.sanity += rules.booster_sanity
+            events.append('booster')
+        elif self.rng.randint(1, 100) <= rules.heart_chance:
+            self.hearts_of_dead += 1
+            events.append('heart')
+
+    def move_ghost(self, events):
+        """Logic to move the ghost based on difficulty level."""
+        if self.ghost_hunt:
+            self.hunt_duration -= 1
+            self.ghost_position = self.select_pathfinding(self.ghost_position, self.player_position)
+            if self.hunt_duration == 0:
+                self.ghost_hunt = False
+                self.ghost_move_counter = 0
+                events.append('hunt_over')
+        elif self.ghost_move_counter >= self.rules.hunt_after:
+            self.ghost_hunt = True
+            self.hunt_duration = self.rng.randint(*self.rules.hunt_turns)
+            events.append('hunt')
+        else:
+            self.ghost_move_counter += 1
+            chance = self.difficulties[self.difficulty].ghost_move_chance
+            if chance >= 1 or self.rng.random() < chance:
+                self.ghost_position = self.select_pathfinding(self.ghost_position, self.player_position)
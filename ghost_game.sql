@@ -6,5 +6,12 @@ CREATE TABLE user_stats (
     games_played INT DEFAULT 0,
     total_score INT DEFAULT 0,
     best_score INT DEFAULT 0,
-    hearts_of_dead INT DEFAULT 0
+    hearts_of_dead INT DEFAULT 0,
+    INDEX idx_best_score (best_score, player_name),
+    INDEX idx_total_score (total_score, player_name)
 );
+
+-- For a database created before the leaderboard indexes existed:
+-- ALTER TABLE user_stats
+--     ADD INDEX idx_best_score (best_score, player_name),
+--     ADD INDEX idx_total_score (total_score, player_name);
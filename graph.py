@@ -0,0 +1,93 @@
+import numpy as np
+
+
+class CSRGraph:
+    """Undirected weighted graph stored in compressed-sparse-row form.
+
+    The neighbours of node u are indices[indptr[u]:indptr[u+1]] and the
+    matching edge weights sit at the same offsets in weights. Every edge is
+    stored once in each direction. Nodes are the integers 0..n-1.
+    """
+
+    def __init__(self, indptr, indices, weights):
+        self.indptr = np.ascontiguousarray(indptr, dtype=np.int64)
+        self.indices = np.ascontiguousarray(indices, dtype=np.int32)
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.n = len(self.indptr) - 1
+
+    @classmethod
+    def from_edges(cls, n, u, v, w):
+        """Build from parallel arrays of undirected edges (each edge listed once)."""
+        u = np.asarray(u, dtype=np.int32)
+        v = np.asarray(v, dtype=np.int32)
+        w = np.asarray(w, dtype=np.float32)
+        src = np.concatenate([u, v])
+        dst = np.concatenate([v, u])
+        order = np.lexsort((dst, src))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        return cls(indptr, dst[order], np.concatenate([w, w])[order])
+
+    @classmethod
+    def from_networkx(cls, G, weight='weight', default=1.0):
+        edges = list(G.edges(data=weight, default=default))
+        u = [e[0] for e in edges]
+        v = [e[1] for e in edges]
+        w = [e[2] for e in edges]
+        return cls.from_edges(G.number_of_nodes(), u, v, w)
+
+    def number_of_edges(self):
+        return len(self.indices) // 2
+
+    def degree(self, u):
+        return int(self.indptr[u + 1] - self.indptr[u])
+
+    def neighbors(self, u):
+        return self.indices[self.indptr[u]:self.indptr[u + 1]]
+
+    def _edge_index(self, u, v):
+        start, stop = self.indptr[u], self.indptr[u + 1]
+        hits = np.nonzero(self.indices[start:stop] == v)[0]
+        return None if len(hits) == 0 else int(start + hits[0])
+
+    def edge_weight(self, u, v):
+        k = self._edge_index(u, v)
+        return None if k is None else float(self.weights[k])
+
+    def set_edge_weight(self, u, v, weight):
+        """Change an existing edge's weight in both directions (inf closes it)."""
+        forward, backward = self._edge_index(u, v), self._edge_index(v, u)
+        if forward is None:
+            raise ValueError(f"no edge between {u} and {v}")
+        self.weights[forward] = weight
+        self.weights[backward] = weight
+
+    def open_edges(self):
+        """This graph without its closed (infinite-weight) edges; self if none are closed."""
+        keep = np.isfinite(self.weights)
+        if keep.all():
+            return self
+        src = np.repeat(np.arange(self.n), np.diff(self.indptr))
+        indptr = np.zeros(self.n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src[keep], minlength=self.n), out=indptr[1:])
+        return CSRGraph(indptr, self.indices[keep], self.weights[keep])
+
+    def adjacency(self):
+        """Plain memoryviews of the arrays for tight Python loops.
+
+        Indexing a memoryview yields Python ints and floats directly, which
+        is several times cheaper than indexing the NumPy arrays one element
+        at a time.
+        """
+        return memoryview(self.indptr), memoryview(self.indices), memoryview(self.weights)
+
+    def to_networkx(self):
+        import networkx as nx
+
+        G = nx.Graph()
+        G.add_nodes_from(range(self.n))
+        src = np.repeat(np.arange(self.n, dtype=np.int32), np.diff(self.indptr))
+        keep = src < self.indices
+        G.add_weighted_edges_from(zip(src[keep].tolist(), self.indices[keep].tolist(),
+                                      self.weights[keep].tolist()))
+        return G
@@ -0,0 +1,62 @@
+import math
+import random
+
+import numpy as np
+
+from pathfinding import shortest_distances
+
+# Edge weights are stored as float32, which can round a length down by a
+# few ulps; shrinking the straight-line estimate keeps it a lower bound.
+_FLOAT32_SLACK = 1.0 - 1e-6
+
+
+class EuclideanHeuristic:
+    """Straight-line distance between node positions.
+
+    Admissible whenever edge weights are at least the Euclidean length of
+    the edge, which holds for maps from generate_map.
+    """
+
+    def __init__(self, pos):
+        pos = np.asarray(pos, dtype=np.float64)
+        self.x = pos[:, 0].tolist()
+        self.y = pos[:, 1].tolist()
+
+    def __call__(self, node, goal):
+        return math.hypot(self.x[node] - self.x[goal], self.y[node] - self.y[goal]) * _FLOAT32_SLACK
+
+
+class LandmarkHeuristic:
+    """ALT heuristic: triangle-inequality bounds from a few landmark nodes.
+
+    For every landmark L, |d(L, node) - d(L, goal)| is a lower bound on
+    d(node, goal); the heuristic is the largest of these. Landmarks are
+    picked by farthest-point selection and their distance tables are built
+    once per map (one full Dijkstra per landmark). Works for any
+    non-negative weights, not just geometric ones.
+    """
+
+    def __init__(self, graph, landmarks=4, seed=None):
+        rng = random.Random(seed)
+        chosen = [rng.randrange(graph.n)]
+        tables = [shortest_distances(graph, chosen[0])]
+        closest = tables[0].copy()
+        while len(chosen) < min(landmarks, graph.n):
+            # unreachable nodes would always win the argmax, so skip them
+            candidate = int(np.argmax(np.where(np.isinf(closest), -1.0, closest)))
+            if closest[candidate] <= 0:
+                break
+            chosen.append(candidate)
+            tables.append(shortest_distances(graph, candidate))
+            np.minimum(closest, tables[-1], out=closest)
+        self.landmarks = chosen
+        self.distances = np.vstack(tables)
+        self._rows = self.distances.T.tolist()
+
+    def __call__(self, node, goal):
+        best = 0.0
+        for a, b in zip(self._rows[node], self._rows[goal]):
+            d = a - b if a > b else b - a
+            if d > best:
+                best = d
+        return best * _FLOAT32_SLACK
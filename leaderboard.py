@@ -0,0 +1,89 @@
+import threading
+import time
+
+# Columns with a secondary index in ghost_game.sql / storage.SQLITE_SCHEMA.
+RANKED_COLUMNS = ('best_score', 'total_score')
+
+
+class Leaderboard:
+    """Top-K and rank queries over user_stats, behind a read-through cache.
+
+    Both queries run off the (score, player_name) indexes: top() reads the
+    first k index entries, rank() counts the entries above one score.
+    Results are cached for ttl seconds and the whole cache is dropped
+    whenever the stats store commits a batch, so a finished game shows up
+    on the board as soon as it is written.
+    """
+
+    def __init__(self, store, ttl=30.0):
+        self.store = store
+        self.ttl = ttl
+        self._cache = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        store.add_commit_listener(self.invalidate)
+
+    def invalidate(self, player_names=None):
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def _cached(self, key, query):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None and hit[0] > now:
+                return hit[1]
+            generation = self._generation
+        value = query()
+        with self._lock:
+            # a commit during the query makes the result stale already
+            if generation == self._generation:
+                self._cache[key] = (now + self.ttl, value)
+        return value
+
+    def _fetch(self, sql, params):
+        backend = self.store.backend
+        try:
+            with backend.pool.connection() as db:
+                cursor = db.cursor()
+                try:
+                    cursor.execute(sql, params)
+                    return cursor.fetchall()
+                finally:
+                    cursor.close()
+        except backend.Error as err:
+            print(f"Error reading leaderboard: {err}")
+            return None
+
+    def top(self, column='best_score', k=10):
+        """The k best players by column, as a list of (player_name, score)."""
+        _check_column(column)
+        p = self.store.backend.placeholder
+
+        def query():
+            rows = self._fetch(
+                f"SELECT player_name, {column} FROM user_stats "
+                f"ORDER BY {column} DESC, player_name LIMIT {p}", (k,))
+            return [tuple(row) for row in rows] if rows is not None else []
+
+        return self._cached(('top', column, k), query)
+
+    def rank(self, player_name, column='best_score'):
+        """1-based rank of player_name by column (ties share a rank), or None if unknown."""
+        _check_column(column)
+        p = self.store.backend.placeholder
+
+        def query():
+            rows = self._fetch(f"SELECT {column} FROM user_stats WHERE player_name = {p}", (player_name,))
+            if not rows:
+                return None
+            rows = self._fetch(f"SELECT COUNT(*) FROM user_stats WHERE {column} > {p}", (rows[0][0],))
+            return rows[0][0] + 1 if rows else None
+
+        return self._cached(('rank', column, player_name), query)
+
+
+def _check_column(column):
+    if column not in RANKED_COLUMNS:
+        raise ValueError(f"leaderboard column must be one of {RANKED_COLUMNS}, not {column!r}")
@@ -0,0 +1,286 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import string
+import sys
+import time
+import urllib.request
+
+from protocol import KEYFRAME, MOVE, NAME, TEXT, FrameReader, ProtocolError, WorldView, decode, pack_frame
+from ser import PORT, TICK_INTERVAL
+from world import MOVES
+
+# A bot's symbol on the grid is the first letter of its name, which is how
+# it finds itself in the frames; bots cycle through these so that the
+# players in one room almost always have different symbols.
+SYMBOLS = string.ascii_uppercase + string.digits
+# Moves a bot makes per second; the server allows 10 with a burst of 2.
+MOVE_RATE = 8.0
+# A move the bot's own position does not reflect within this long is counted as dropped.
+MOVE_TIMEOUT = 0.5
+STRATEGIES = ("random", "flee")
+
+
+def summarize(samples):
+    """count, mean and percentiles of a list of seconds."""
+    if not samples:
+        return {"count": 0}
+    samples = sorted(samples)
+    last = len(samples) - 1
+
+    def pick(q):
+        return round(samples[round(q * last)], 6)
+
+    return {"count": len(samples), "mean": round(sum(samples) / len(samples), 6),
+            "p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": round(samples[-1], 6)}
+
+
+class Bot(asyncio.BufferedProtocol):
+    """A scripted player speaking the same framed protocol as cli.py.
+
+    It sends its name, then one move at a time at rate moves per second,
+    and keeps the room in a WorldView to pick its moves and to see when
+    they land. Every state frame carries the server's tick, so its arrival
+    time, less the tick's place in the schedule, gives the tick jitter;
+    the time from sending a move to the first frame showing the bot on
+    its new cell is the broadcast latency.
+    """
+
+    def __init__(self, index, strategy="random", rate=MOVE_RATE, rng=None):
+        self.name = f"{SYMBOLS[index % len(SYMBOLS)]}bot{index}"
+        self.symbol = self.name[0]
+        self.strategy = strategy
+        self.interval = 1 / rate
+        self.rng = rng if rng is not None else random.Random()
+        self.frames = FrameReader()
+        self.world = WorldView()
+        self.transport = None
+        self.closed = asyncio.get_running_loop().create_future()
+        self.player_no = None
+        self.caught = False
+        self.pending = None
+        self.offsets = []
+        self.latencies = []
+        self.sent = 0
+        self.confirmed = 0
+        self.dropped = 0
+        self.error = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.write(pack_frame(NAME, self.name.encode()))
+
+    def get_buffer(self, sizehint):
+        return self.frames.free()
+
+    def buffer_updated(self, nbytes):
+        now = time.monotonic()
+        try:
+            for frame_type, payload in self.frames.feed(nbytes):
+                message = decode(frame_type, payload)
+                if message["t"] != TEXT:
+                    self.on_state(message, now)
+        except (ProtocolError, UnicodeDecodeError, ValueError) as err:
+            self.error = str(err)
+            self.transport.close()
+
+    def connection_lost(self, exc):
+        # the server closes on players with moves still unread at the end of a game
+        ended = self.world.synced and isinstance(exc, ConnectionResetError)
+        if exc is not None and not ended and self.error is None:
+            self.error = str(exc)
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+    def on_state(self, message, now):
+        self.world.apply(message)
+        if not self.world.synced:
+            return
+        self.offsets.append(now - message["tick"] * TICK_INTERVAL)
+        if self.player_no is None and message["t"] == KEYFRAME:
+            mine = [no for no, entry in self.world.players.items() if entry[0] == self.symbol]
+            if len(mine) == 1:
+                self.player_no = mine[0]
+        if self.player_no is None:
+            return
+        position = self.position()
+        if position is None:
+            self.caught = True
+            self.pending = None
+        elif self.pending is not None and position == self.pending[1]:
+            self.latencies.append(now - self.pending[0])
+            self.confirmed += 1
+            self.pending = None
+
+    def position(self):
+        entry = self.world.players.get(self.player_no)
+        return None if entry is None else tuple(entry[1:])
+
+    def legal_moves(self, position):
+        walls = set(map(tuple, self.world.walls))
+        moves = []
+        for key, (d_row, d_col) in MOVES.items():
+            cell = (position[0] + d_row, position[1] + d_col)
+            if 0 <= cell[0] < self.world.size and 0 <= cell[1] < self.world.size and cell not in walls:
+                moves.append((key, cell))
+        return moves
+
+    def choose(self, position):
+        """(key, cell) of the next move, or None if the bot is boxed in."""
+        moves = self.legal_moves(position)
+        if not moves:
+            return None
+        if self.strategy == "flee" and self.world.ghosts:
+            # ghosts move diagonally too, so the king-move distance is what counts
+            def gap(move):
+                cell = move[1]
+                return min(max(abs(cell[0] - row), abs(cell[1] - col)) for row, col in self.world.ghosts)
+
+            best = max(gap(move) for move in moves)
+            moves = [move for move in moves if gap(move) == best]
+        return self.rng.choice(moves)
+
+    async def play(self):
+        """Move until the server ends the game or the bot is caught."""
+        while not self.closed.done():
+            await asyncio.wait([self.closed], timeout=self.interval * self.rng.uniform(0.8, 1.2))
+            if self.closed.done() or self.caught or self.player_no is None:
+                continue
+            now = time.monotonic()
+            if self.pending is not None:
+                if now - self.pending[0] < MOVE_TIMEOUT:
+                    continue
+                self.dropped += 1
+                self.pending = None
+            position = self.position()
+            move = self.choose(position) if position is not None else None
+            if move is None:
+                continue
+            self.transport.write(pack_frame(MOVE, move[0].encode()))
+            self.sent += 1
+            self.pending = (now, move[1])
+
+    def result(self):
+        # arrival time minus scheduled time, relative to this bot's earliest frame
+        base = min(self.offsets, default=0.0)
+        return {"jitter": [offset - base for offset in self.offsets], "latency": self.latencies,
+                "sent": self.sent, "confirmed": self.confirmed, "dropped": self.dropped,
+                "caught": self.caught, "error": self.error}
+
+
+async def run_bot(index, host, port, strategy, rate, seed, start_delay):
+    await asyncio.sleep(start_delay)
+    loop = asyncio.get_running_loop()
+    rng = random.Random(f"{seed}:{index}")
+    started = time.monotonic()
+    try:
+        _, bot = await loop.create_connection(lambda: Bot(index, strategy, rate, rng), host, port)
+    except OSError as err:
+        return {"connect": None, "error": str(err)}
+    connect = time.monotonic() - started
+    await bot.play()
+    return dict(bot.result(), connect=connect)
+
+
+async def run_bots(indices, host, port, strategy="random", rate=MOVE_RATE, ramp=0.0, seed=0, timeout=None):
+    count = max(1, len(indices))
+    bots = [run_bot(index, host, port, strategy, rate, seed, ramp * i / count) for i, index in enumerate(indices)]
+    tasks = [asyncio.ensure_future(bot) for bot in bots]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    return [task.result() for task in done]
+
+
+def _worker(args):
+    indices, options = args
+    return asyncio.run(run_bots(indices, **options))
+
+
+def scrape(url):
+    """Counter values from a Prometheus text endpoint such as the one ser.py serves."""
+    with urllib.request.urlopen(url, timeout=5) as response:
+        text = response.read().decode()
+    counters = set()
+    values = {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE ") and line.endswith(" counter"):
+            counters.add(line.split()[2])
+        elif line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            values[name] = float(value)
+    return {name: value for name, value in values.items() if name in counters}
+
+
+def load_test(bots, host="127.0.0.1", port=PORT, strategy="random", rate=MOVE_RATE, ramp=0.0,
+              workers=1, seed=0, timeout=None, metrics_url=None):
+    """Run bots clients to the end of their games and return the report as a dict.
+
+    With workers > 1 the bots are shared out over that many processes, so
+    that the clients themselves do not become the bottleneck.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"strategy must be one of {', '.join(STRATEGIES)}, not {strategy!r}")
+    before = scrape(metrics_url) if metrics_url else None
+    options = {"host": host, "port": port, "strategy": strategy, "rate": rate, "ramp": ramp,
+               "seed": seed, "timeout": timeout}
+    started = time.monotonic()
+    if workers > 1:
+        # interleaved, so that every worker ramps up over the whole ramp
+        shares = [(list(range(i, bots, workers)), options) for i in range(workers)]
+        with multiprocessing.Pool(workers) as pool:
+            results = [result for part in pool.map(_worker, shares) for result in part]
+    else:
+        results = asyncio.run(run_bots(list(range(bots)), **options))
+    elapsed = time.monotonic() - started
+
+    played = [result for result in results if result["connect"] is not None]
+    sent = sum(result["sent"] for result in played)
+    dropped = sum(result["dropped"] for result in played)
+    report = {
+        "bots": bots,
+        "strategy": strategy,
+        "move_rate": rate,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "connect": {"failed": len(results) - len(played), "unfinished": bots - len(results),
+                    "seconds": summarize([result["connect"] for result in played])},
+        "tick_jitter_seconds": summarize([value for result in played for value in result["jitter"]]),
+        "broadcast_latency_seconds": summarize([value for result in played for value in result["latency"]]),
+        "moves": {"sent": sent, "confirmed": sum(result["confirmed"] for result in played),
+                  "dropped": dropped, "drop_rate": round(dropped / sent, 4) if sent else 0.0},
+        "caught": sum(result["caught"] for result in played),
+        "errors": sorted({result["error"] for result in results if result["error"]}),
+    }
+    if metrics_url:
+        after = scrape(metrics_url)
+        report["server"] = {name: value - before.get(name, 0) for name, value in sorted(after.items())}
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the multiplayer server with scripted bot clients")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--bots", type=int, default=300)
+    parser.add_argument("--strategy", choices=STRATEGIES, default="random")
+    parser.add_argument("--rate", type=float, default=MOVE_RATE, help="moves per second per bot")
+    parser.add_argument("--ramp", type=float, default=0.0, help="seconds over which the bots connect")
+    parser.add_argument("--workers", type=int, default=1, help="client processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=None, help="give up on bots still playing after this")
+    parser.add_argument("--metrics-url", default=None,
+                        help="server metrics endpoint, e.g. http://127.0.0.1:9100/, to add its counters")
+    parser.add_argument("--output", default=None, help="write the report here instead of to stdout")
+    args = parser.parse_args()
+    report = load_test(args.bots, args.host, args.port, args.strategy, args.rate, args.ramp,
+                       args.workers, args.seed, args.timeout, args.metrics_url)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(text + "\n")
+    else:
+        print(text)
+    sys.exit(1 if report["connect"]["failed"] or report["connect"]["unfinished"] else 0)
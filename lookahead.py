@@ -0,0 +1,201 @@
+import time
+
+# Value of catching the player; a catch d plies before the search horizon
+# is worth WIN + d, so sooner catches are preferred.
+WIN = 10000
+# How the ghost expects the player to move: to the neighbour farthest from
+# the ghost with this chance, otherwise to any neighbour.
+FLEE_CHANCE = 0.75
+# Nodes searched between looks at the clock.
+_CLOCK_INTERVAL = 64
+# The transposition table is emptied when it grows past this many entries.
+TABLE_LIMIT = 1 << 20
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+class ExpectimaxGhost:
+    """Ghost that looks ahead, by iterative-deepening expectimax over (ghost, player) positions.
+
+    The ghost moves to a neighbour or stays put; the player is expected to
+    run from the ghost most of the time (flee_chance) and otherwise to
+    move to any of its neighbours. Positions at the
+    horizon score the negated hop distance between the two. Searches of
+    depth 1, 2, ... run until budget seconds are up, and the best move of
+    the deepest search (including a partly finished one, whose first move
+    is always the previous best) is played. Results are kept in a
+    transposition table keyed by (ghost, player, depth), packed into one
+    int so that the garbage collector never walks it; it carries over
+    between turns, since the map does not change.
+
+    Ghost moves are tried in order of distance to the player and player
+    moves farthest from the ghost first, so a chance node can stop
+    early (Star1) once even the best outcome of its remaining moves could
+    not beat a sibling that was already searched. hops is the map's
+    all-pairs hop-distance matrix and neighbors a list of neighbour lists,
+    both zero-indexed. With budget None the search simply stops at
+    max_depth, which makes the ghost's moves reproducible.
+    """
+
+    def __init__(self, hops, neighbors, budget=0.02, max_depth=32, flee_chance=FLEE_CHANCE):
+        self.hops = hops.tolist() if hasattr(hops, 'tolist') else hops
+        self.neighbors = neighbors
+        self.n = len(neighbors)
+        self.flee_chance = flee_chance
+        self.budget = budget
+        self.max_depth = max_depth
+        self.table = {}
+        self.best_moves = {}
+        self.depth = 0
+        self.nodes = 0
+        self.elapsed = 0.0
+        self.table_probes = 0
+        self.table_hits = 0
+        self.total_nodes = 0
+        self._deadline = None
+        self._clock = 0
+        self._partial = None
+
+    @property
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def hit_rate(self):
+        return self.table_hits / self.table_probes if self.table_probes else 0.0
+
+    def stats(self):
+        """Figures for the latest move: depth reached, nodes, time, table hit rate."""
+        return {'depth': self.depth, 'nodes': self.nodes, 'elapsed': self.elapsed,
+                'nodes_per_second': self.nodes_per_second, 'hit_rate': self.hit_rate}
+
+    def next_move(self, ghost, player):
+        """The ghost's move from ghost with the player at player; returns the node to move to."""
+        started = time.perf_counter()
+        self._deadline = started + self.budget if self.budget is not None else None
+        self._clock = _CLOCK_INTERVAL
+        self.nodes = self.table_probes = self.table_hits = 0
+        self.depth = 0
+        if len(self.table) > TABLE_LIMIT:
+            self.table.clear()
+            self.best_moves.clear()
+
+        best = None
+        if player in self.neighbors[ghost] or ghost == player:
+            best = player
+        else:
+            for depth in range(1, self.max_depth + 1):
+                self._partial = None
+                try:
+                    complete = self._root(ghost, player, depth)
+                except _OutOfTime:
+                    # the previous best is searched first, so a partly searched depth still improves on it
+                    if self._partial is not None:
+                        best = self._partial
+                    break
+                best = self._partial
+                self.depth = depth
+                if complete:
+                    break
+            if best is None:
+                # out of time before even one move was searched: step towards the player
+                best = self._ordered_moves(ghost, player)[0]
+        self.elapsed = time.perf_counter() - started
+        self.total_nodes += self.nodes
+        return best
+
+    def _ordered_moves(self, ghost, player):
+        row = self.hops
+        moves = sorted(self.neighbors[ghost] + [ghost], key=lambda move: row[move][player])
+        first = self.best_moves.get(ghost * self.n + player)
+        if first is not None and first != moves[0]:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def _root(self, ghost, player, depth):
+        """Search one depth from the root; returns whether a deeper search is pointless."""
+        best_value = None
+        for move in self._ordered_moves(ghost, player):
+            value = self._chance(move, player, depth, best_value)
+            if best_value is None or value > best_value:
+                best_value = value
+                self._partial = move
+        self.best_moves[ghost * self.n + player] = self._partial
+        # a catch the player cannot avoid stays one however deep the search goes
+        return best_value >= WIN
+
+    def _tick(self):
+        self.nodes += 1
+        self._clock -= 1
+        if self._clock == 0:
+            self._clock = _CLOCK_INTERVAL
+            if self._deadline is not None and time.perf_counter() > self._deadline:
+                raise _OutOfTime
+
+    def _upper_bound(self, ghost, player, depth):
+        """Most the ghost can hope for from (ghost, player) with depth moves each to go."""
+        distance = self.hops[ghost][player]
+        if distance <= 2 * depth:
+            return WIN + depth
+        return -(distance - 2 * depth)
+
+    def _max(self, ghost, player, depth):
+        """Value of the position with the ghost to move."""
+        self._tick()
+        if depth == 0:
+            return -self.hops[ghost][player]
+        key = (depth * self.n + ghost) * self.n + player
+        self.table_probes += 1
+        value = self.table.get(key)
+        if value is not None:
+            self.table_hits += 1
+            return value
+        best_value = None
+        for move in self._ordered_moves(ghost, player):
+            if move == player:
+                value = WIN + depth
+            else:
+                value = self._chance(move, player, depth, best_value)
+            if best_value is None or value > best_value:
+                best_value = value
+                self.best_moves[ghost * self.n + player] = move
+                if value >= WIN + depth:
+                    break
+        # pruned children only ever return bounds below best_value, so this is exact
+        self.table[key] = best_value
+        return best_value
+
+    def _chance(self, ghost, player, depth, alpha):
+        """Expected value over the player's replies once the ghost is on ghost.
+
+        Stops early and returns an upper bound no higher than alpha as soon
+        as the replies left could not lift the expectation above it.
+        """
+        self._tick()
+        row = self.hops[ghost]
+        replies = sorted(self.neighbors[player], key=lambda reply: -row[reply])
+        if not replies:
+            return self._max(ghost, player, depth - 1)
+        farthest = row[replies[0]]
+        fleeing = sum(1 for reply in replies if row[reply] == farthest)
+        anywhere = (1 - self.flee_chance) / len(replies)
+        chances = [anywhere + (self.flee_chance / fleeing if row[reply] == farthest else 0.0)
+                   for reply in replies]
+        bounds = [WIN + depth - 1 if reply == ghost else self._upper_bound(ghost, reply, depth - 1)
+                  for reply in replies]
+        remaining = sum(chance * bound for chance, bound in zip(chances, bounds))
+        total = 0.0
+        for reply, chance, bound in zip(replies, chances, bounds):
+            if reply == ghost:
+                # the player walks into the ghost
+                value = WIN + depth - 1
+            else:
+                value = self._max(ghost, reply, depth - 1)
+            total += chance * value
+            remaining -= chance * bound
+            if alpha is not None and total + remaining <= alpha:
+                return total + remaining
+        return total
@@ -0,0 +1,256 @@
+import math
+
+import numpy as np
+
+from graph import CSRGraph
+
+# Forward half of the 3x3 cell neighbourhood; together with i < j inside the
+# same cell this visits every unordered pair of nearby points exactly once.
+_HALF_NEIGHBOURHOOD = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+# How many rings of cells the vectorised nearest-component search covers
+# first, and how many times it doubles that for components that found no
+# other component, before _nearest_outside takes over.
+_BRIDGE_RINGS = 2
+_BRIDGE_TIERS = 3
+
+# Most node-to-candidate distances _nearest_outside computes at once.
+_DISTANCE_CHUNK = 1 << 21
+
+
+def generate_map(n_nodes=24, radius=0.2, seed=None):
+    """Random geometric map on the unit square, guaranteed to be connected.
+
+    Points closer than radius are joined. Candidate pairs come from a
+    spatial hash with cells of side radius, so construction is roughly
+    O(n log n) instead of comparing all pairs. Nodes are numbered in cell
+    order, which keeps spatial neighbours close together in the CSR arrays.
+    Edge weights are Euclidean lengths. Returns (positions, CSRGraph), with
+    positions an (n, 2) float array.
+    """
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n_nodes, 2))
+    grid = _SpatialHash(pos, radius)
+    pos = grid.pos
+
+    u, v = _radius_pairs(grid)
+    bu, bv = _bridge_components(grid, u, v)
+    u = np.concatenate([u, bu])
+    v = np.concatenate([v, bv])
+    weights = np.hypot(*(pos[u] - pos[v]).T)
+    return pos, CSRGraph.from_edges(n_nodes, u, v, weights)
+
+
+class _SpatialHash:
+    """Points bucketed into square cells of side radius, stored in cell order."""
+
+    def __init__(self, pos, radius):
+        self.radius = radius
+        self.cells = max(1, math.ceil(1.0 / radius))
+        cell_xy = np.minimum((pos / radius).astype(np.int64), self.cells - 1)
+        keys = cell_xy[:, 0] * self.cells + cell_xy[:, 1]
+        order = np.argsort(keys, kind='stable')
+        self.pos, self.cell_xy, self.keys = pos[order], cell_xy[order], keys[order]
+
+    def cell_range(self, cx, cy):
+        """Node ranges [lo, hi) for arrays of cell coordinates (empty when off the grid)."""
+        valid = (cx >= 0) & (cx < self.cells) & (cy >= 0) & (cy < self.cells)
+        wanted = cx * self.cells + cy
+        lo = np.searchsorted(self.keys, wanted, 'left')
+        hi = np.where(valid, np.searchsorted(self.keys, wanted, 'right'), lo)
+        return lo, hi
+
+    def pairs(self, sources, dx, dy):
+        """Every (source, j) with j in the cell offset by (dx, dy) from the source's cell.
+
+        sources must be in ascending order.
+        """
+        # sources are in cell order and sources sharing a cell share a
+        # range, so look each cell up once
+        keys = self.keys[sources]
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+        first = sources[starts]
+        lo, hi = self.cell_range(self.cell_xy[first, 0] + dx, self.cell_xy[first, 1] + dy)
+        run = np.diff(np.append(starts, len(sources)))
+        lo, hi = np.repeat(lo, run), np.repeat(hi, run)
+        counts = hi - lo
+        total = int(counts.sum())
+        i = np.repeat(sources, counts)
+        j = np.repeat(lo, counts) + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return i, j
+
+
+def _radius_pairs(grid):
+    nodes = np.arange(len(grid.pos))
+    r2 = grid.radius * grid.radius
+    found_u, found_v = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    for dx, dy in _HALF_NEIGHBOURHOOD:
+        i, j = grid.pairs(nodes, dx, dy)
+        delta = grid.pos[i] - grid.pos[j]
+        keep = np.einsum('ij,ij->i', delta, delta) <= r2
+        if dx == 0 and dy == 0:
+            keep &= i < j
+        found_u.append(i[keep])
+        found_v.append(j[keep])
+    return np.concatenate(found_u), np.concatenate(found_v)
+
+
+def _component_labels(n, u, v):
+    """Smallest node id in each node's component, by hooking and pointer jumping."""
+    label = np.arange(n)
+    while True:
+        lu, lv = label[u], label[v]
+        if np.array_equal(lu, lv):
+            return label
+        # hook every root onto the smallest root it touches, then flatten
+        np.minimum.at(label, lu, lv)
+        np.minimum.at(label, lv, lu)
+        while True:
+            jumped = label[label]
+            if np.array_equal(jumped, label):
+                break
+            label = jumped
+
+
+def _bridge_components(grid, u, v):
+    """Join every component to its nearest other component in one pass.
+
+    Components are visited smallest first and the largest one is skipped.
+    Each visited component is bridged to the nearest node outside its
+    current set, so every bridge merges two sets and k components need
+    exactly k - 1 bridges. Sets are kept as a label per component, and a
+    merge relabels the smaller set, so membership tests are array lookups.
+    """
+    label = _component_labels(len(grid.pos), u, v)
+    roots, comp_of, sizes = np.unique(label, return_inverse=True, return_counts=True)
+    comp_of = comp_of.ravel()
+    if len(roots) <= 1:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    visit = np.argsort(sizes, kind='stable')[:-1]
+    near_i, near_j, _, spans = _nearby_other_components(grid, comp_of, np.isin(comp_of, visit))
+    members = np.split(np.argsort(comp_of, kind='stable'), np.cumsum(sizes)[:-1])
+    set_of = np.arange(len(roots))
+    set_comps = {comp: [comp] for comp in range(len(roots))}
+    bridges_u, bridges_v = [], []
+    for comp in visit.tolist():
+        own = int(set_of[comp])
+        # candidates are sorted by distance and cover everything within the
+        # component's search reach, so the first one outside own is exact
+        lo, hi = spans.get(comp, (0, 0))
+        outside = np.flatnonzero(set_of[comp_of[near_j[lo:hi]]] != own)
+        if len(outside):
+            k = lo + int(outside[0])
+            a, b = int(near_i[k]), int(near_j[k])
+        else:
+            _, a, b = _nearest_outside(grid, members[comp], own, set_of, comp_of)
+        other = int(set_of[comp_of[b]])
+        small, large = (own, other) if len(set_comps[own]) <= len(set_comps[other]) else (other, own)
+        set_of[set_comps[small]] = large
+        set_comps[large].extend(set_comps.pop(small))
+        bridges_u.append(a)
+        bridges_v.append(b)
+    return np.array(bridges_u, dtype=np.int64), np.array(bridges_v, dtype=np.int64)
+
+
+def _nearby_other_components(grid, comp_of, active):
+    """Vectorised search for pairs joining an active node to another component.
+
+    Looks at every cell within _BRIDGE_RINGS rings of each active node and
+    keeps the pairs closer than _BRIDGE_RINGS * radius, which are all such
+    pairs in that range. Components that found nothing are searched again
+    twice as far out, up to _BRIDGE_TIERS times in all, so each
+    component's pairs cover everything within its own reach. Returns the
+    pairs sorted by (component, distance) and a dict mapping each
+    component to its [lo, hi) slice.
+    """
+    found_i, found_j = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    found_d2 = [np.empty(0)]
+    rings = _BRIDGE_RINGS
+    for _ in range(_BRIDGE_TIERS):
+        sources = np.nonzero(active)[0]
+        if not len(sources):
+            break
+        reach = rings * grid.radius
+        span = range(-rings, rings + 1)
+        tier_i = [np.empty(0, dtype=np.int64)]
+        for dx in span:
+            for dy in span:
+                i, j = grid.pairs(sources, dx, dy)
+                keep = comp_of[i] != comp_of[j]
+                i, j = i[keep], j[keep]
+                delta = grid.pos[i] - grid.pos[j]
+                d2 = np.einsum('ij,ij->i', delta, delta)
+                keep = d2 <= reach * reach
+                tier_i.append(i[keep])
+                found_j.append(j[keep])
+                found_d2.append(d2[keep])
+        found_i.extend(tier_i)
+        active = active & ~np.isin(comp_of, comp_of[np.concatenate(tier_i)])
+        rings *= 2
+    i, j = np.concatenate(found_i), np.concatenate(found_j)
+    dist = np.sqrt(np.concatenate(found_d2))
+    order = np.lexsort((dist, comp_of[i]))
+    i, j, dist = i[order], j[order], dist[order]
+    comps, first, counts = np.unique(comp_of[i], return_index=True, return_counts=True)
+    spans = {c: (f, f + k) for c, f, k in zip(comps.tolist(), first.tolist(), counts.tolist())}
+    return i, j, dist, spans
+
+
+def _dilate(mask, r):
+    """Cells within Chebyshev distance r of a set cell of the boolean grid mask."""
+    for axis in (0, 1):
+        counts = np.cumsum(mask, axis=axis, dtype=np.int32)
+        counts = np.concatenate([np.zeros_like(counts.take([0], axis=axis)), counts], axis=axis)
+        size = mask.shape[axis]
+        hi = np.minimum(np.arange(size) + r + 1, size)
+        lo = np.maximum(np.arange(size) - r, 0)
+        mask = (counts.take(hi, axis=axis) - counts.take(lo, axis=axis)) > 0
+    return mask
+
+
+def _nearest_outside(grid, nodes, own, set_of, comp_of):
+    """Nearest (distance, node, other) pair from nodes to a node outside set own.
+
+    Works on the cells the nodes occupy: the cells within r rings of them
+    are a dilation of that cell mask, taken in blocks of rings that double
+    in width, and only the nodes outside own in the newly reached cells
+    are measured against nodes. Ring r only holds points at least
+    (r - 1) * radius away, so the search stops once that exceeds the best
+    distance found so far.
+    """
+    cells = grid.cells
+    cx, cy = grid.cell_xy[nodes, 0], grid.cell_xy[nodes, 1]
+    best = (math.inf, -1, -1)
+    reached = None
+    r0, width = 0, _BRIDGE_RINGS + 1
+    while r0 <= cells and (r0 - 1) * grid.radius <= best[0]:
+        r1 = r0 + width
+        # the part of the grid within r1 - 1 rings of the nodes' bounding box
+        x0, y0 = max(0, int(cx.min()) - r1 + 1), max(0, int(cy.min()) - r1 + 1)
+        x1, y1 = min(cells, int(cx.max()) + r1), min(cells, int(cy.max()) + r1)
+        mask = np.zeros((x1 - x0, y1 - y0), dtype=bool)
+        mask[cx - x0, cy - y0] = True
+        within = _dilate(mask, r1 - 1)
+        new = within.copy()
+        if reached is not None:
+            ox, oy = reached[1] - x0, reached[2] - y0
+            new[ox:ox + reached[0].shape[0], oy:oy + reached[0].shape[1]] &= ~reached[0]
+        reached = (within, x0, y0)
+        tx, ty = np.nonzero(new)
+        lo, hi = grid.cell_range(tx + x0, ty + y0)
+        counts = hi - lo
+        total = int(counts.sum())
+        others = np.repeat(lo, counts) + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        others = others[set_of[comp_of[others]] != own]
+        step = max(1, _DISTANCE_CHUNK // len(nodes))
+        for start in range(0, len(others), step):
+            chunk = others[start:start + step]
+            delta = grid.pos[nodes][:, None, :] - grid.pos[chunk][None, :, :]
+            dist = np.hypot(delta[..., 0], delta[..., 1])
+            a, b = np.unravel_index(int(np.argmin(dist)), dist.shape)
+            if dist[a, b] < best[0]:
+                best = (float(dist[a, b]), int(nodes[a]), int(chunk[b]))
+        r0 = r1
+        width *= 2
+    return best
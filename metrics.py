@@ -0,0 +1,99 @@
+import asyncio
+from bisect import bisect_left
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Histogram:
+    """Counts observations into fixed buckets; observe() is a bisect and an increment."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (inf if it is past the last bound)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Counters, histograms and gauges, rendered in the Prometheus text format.
+
+    Counters and histograms are updated in place by the code they measure.
+    Gauges are functions that are only called when the metrics are read,
+    so values such as queue depths cost nothing between scrapes.
+    """
+
+    def __init__(self, prefix="ghost_"):
+        self.prefix = prefix
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def inc(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def histogram(self, name, bounds=LATENCY_BUCKETS):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(bounds)
+        return self.histograms[name]
+
+    def gauge(self, name, read):
+        self.gauges[name] = read
+
+    def render(self):
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            name = self.prefix + name
+            lines += [f"# TYPE {name} counter", f"{name} {value}"]
+        for name, read in sorted(self.gauges.items()):
+            name = self.prefix + name
+            lines += [f"# TYPE {name} gauge", f"{name} {read()}"]
+        for name, histogram in sorted(self.histograms.items()):
+            name = self.prefix + name
+            lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{le="{bound:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_sum {histogram.sum:.6f}")
+            lines.append(f"{name}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host="127.0.0.1", port=9100):
+        """Answer every connection with the current metrics, as an HTTP response."""
+
+        async def respond(reader, writer):
+            try:
+                # the request itself does not matter; read its head so the client sees a clean close
+                await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=1.0)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                pass
+            body = self.render().encode()
+            writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+            writer.close()
+
+        return await asyncio.start_server(respond, host, port)
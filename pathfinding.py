@@ -0,0 +1,239 @@
+from collections import deque, namedtuple
+from heapq import heappush, heappop
+
+import numpy as np
+
+# path is the node list from start to goal (None when unreachable), cost its
+# length in edges (bfs) or total weight, and expanded the number of nodes
+# taken off the frontier while searching.
+SearchResult = namedtuple('SearchResult', ['path', 'cost', 'expanded'])
+
+# node is the first step from start towards goal (start itself when they are
+# equal, None when goal is unreachable); cost and expanded as above.
+FirstHop = namedtuple('FirstHop', ['node', 'cost', 'expanded'])
+
+
+def _build_path(parent, start, goal):
+    path = [goal]
+    while path[-1] != start:
+        path.append(parent[path[-1]])
+    path.reverse()
+    return path
+
+
+def bfs(graph, start, goal):
+    """Fewest-hops path from start to goal over a CSRGraph."""
+    if start == goal:
+        return SearchResult([start], 0, 0)
+    indptr, indices, _ = graph.adjacency()
+    parent = memoryview(np.full(graph.n, -1, dtype=np.int32))
+    parent[start] = start
+    queue = deque([start])
+    expanded = 0
+    while queue:
+        current = queue.popleft()
+        expanded += 1
+        for k in range(indptr[current], indptr[current + 1]):
+            neighbor = indices[k]
+            if parent[neighbor] < 0:
+                parent[neighbor] = current
+                if neighbor == goal:
+                    path = _build_path(parent, start, goal)
+                    return SearchResult(path, len(path) - 1, expanded)
+                queue.append(neighbor)
+    return SearchResult(None, float('inf'), expanded)
+
+
+class BFSWorkspace:
+    """Preallocated scratch arrays for repeated BFS over one CSRGraph.
+
+    Nodes are marked visited when they are enqueued by stamping them with
+    the current search generation, so each node enters a queue at most once
+    and nothing has to be cleared or allocated between searches. Only the
+    first hop is recovered from the parent array, by walking back from the
+    node next to the goal.
+    """
+
+    def __init__(self, graph):
+        n = graph.n
+        self.graph = graph
+        self._adjacency = graph.adjacency()
+        self._parent = memoryview(np.zeros(n, dtype=np.int32))
+        self._depth = memoryview(np.zeros(n, dtype=np.int32))
+        self._stamp_array = np.zeros(n, dtype=np.uint32)
+        self._stamp = memoryview(self._stamp_array)
+        self._queues = (memoryview(np.zeros(n, dtype=np.int32)), memoryview(np.zeros(n, dtype=np.int32)))
+        self._generation = 0
+
+    def _next_generation(self):
+        # forward searches stamp with the generation, backward ones with generation + 1
+        if self._generation >= 0xFFFFFFFF - 2:
+            self._stamp_array.fill(0)
+            self._generation = 0
+        self._generation += 2
+        return self._generation
+
+    def _walk_back(self, node, start):
+        parent = self._parent
+        while parent[node] != start:
+            node = parent[node]
+        return node
+
+    def first_hop(self, start, goal, bidirectional=True):
+        """First step of a fewest-hops path from start to goal."""
+        if start == goal:
+            return FirstHop(start, 0, 0)
+        if bidirectional:
+            return self._bidirectional(start, goal)
+
+        indptr, indices, _ = self._adjacency
+        parent, depth, stamp = self._parent, self._depth, self._stamp
+        queue = self._queues[0]
+        mark = self._next_generation()
+        stamp[start] = mark
+        parent[start] = start
+        depth[start] = 0
+        queue[0] = start
+        head, tail = 0, 1
+        while head < tail:
+            current = queue[head]
+            head += 1
+            for k in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[k]
+                if stamp[neighbor] != mark:
+                    stamp[neighbor] = mark
+                    parent[neighbor] = current
+                    depth[neighbor] = depth[current] + 1
+                    if neighbor == goal:
+                        hop = neighbor if current == start else self._walk_back(current, start)
+                        return FirstHop(hop, depth[neighbor], head)
+                    queue[tail] = neighbor
+                    tail += 1
+        return FirstHop(None, float('inf'), head)
+
+    def hop_distances(self, source):
+        """Hops from source to every node, as an array with -1 where unreachable."""
+        indptr, indices, _ = self._adjacency
+        result = np.full(self.graph.n, -1, dtype=np.int32)
+        hops = memoryview(result)
+        queue = self._queues[0]
+        hops[source] = 0
+        queue[0] = source
+        head, tail = 0, 1
+        while head < tail:
+            current = queue[head]
+            head += 1
+            for k in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[k]
+                if hops[neighbor] < 0:
+                    hops[neighbor] = hops[current] + 1
+                    queue[tail] = neighbor
+                    tail += 1
+        return result
+
+    def _bidirectional(self, start, goal):
+        indptr, indices, _ = self._adjacency
+        parent, depth, stamp = self._parent, self._depth, self._stamp
+        forward = self._next_generation()
+        backward = forward + 1
+        for node, mark in ((start, forward), (goal, backward)):
+            stamp[node] = mark
+            parent[node] = node
+            depth[node] = 0
+        queues = self._queues
+        queues[0][0] = start
+        queues[1][0] = goal
+        heads, tails = [0, 0], [1, 1]
+        expanded = 0
+
+        while heads[0] < tails[0] and heads[1] < tails[1]:
+            # grow whole levels of the smaller frontier; once the two sides
+            # touch, finish the level so the shortest crossing is kept
+            side = 0 if tails[0] - heads[0] <= tails[1] - heads[1] else 1
+            mark, other = (forward, backward) if side == 0 else (backward, forward)
+            queue = queues[side]
+            head, tail, level_end = heads[side], tails[side], tails[side]
+            best = None
+            while head < level_end:
+                current = queue[head]
+                head += 1
+                for k in range(indptr[current], indptr[current + 1]):
+                    neighbor = indices[k]
+                    seen = stamp[neighbor]
+                    if seen == other:
+                        total = depth[current] + 1 + depth[neighbor]
+                        if best is None or total < best[0]:
+                            best = (total, current, neighbor)
+                    elif seen != mark:
+                        stamp[neighbor] = mark
+                        parent[neighbor] = current
+                        depth[neighbor] = depth[current] + 1
+                        queue[tail] = neighbor
+                        tail += 1
+            expanded += head - heads[side]
+            heads[side], tails[side] = head, tail
+            if best is not None:
+                total, near, far = best
+                # the forward-side node of the crossing edge lies on the start half of the path
+                start_half, goal_half = (near, far) if side == 0 else (far, near)
+                hop = goal_half if start_half == start else self._walk_back(start_half, start)
+                return FirstHop(hop, total, expanded)
+        return FirstHop(None, float('inf'), expanded)
+
+
+def dijkstra(graph, start, goal):
+    """Cheapest path from start to goal over a CSRGraph."""
+    return astar(graph, start, goal)
+
+
+def astar(graph, start, goal, heuristic=None):
+    """A* over a CSRGraph. With no heuristic this is Dijkstra's algorithm.
+
+    heuristic(node, goal) must never overestimate the remaining cost; see
+    heuristics.py for the ones the game uses.
+    """
+    indptr, indices, weights = graph.adjacency()
+    dist = memoryview(np.full(graph.n, np.inf))
+    parent = memoryview(np.full(graph.n, -1, dtype=np.int32))
+    closed = memoryview(np.zeros(graph.n, dtype=np.uint8))
+    dist[start] = 0.0
+    parent[start] = start
+    heap = [(heuristic(start, goal) if heuristic else 0.0, start)]
+    expanded = 0
+    while heap:
+        _, current = heappop(heap)
+        if closed[current]:
+            continue
+        if current == goal:
+            return SearchResult(_build_path(parent, start, goal), dist[goal], expanded)
+        closed[current] = 1
+        expanded += 1
+        d = dist[current]
+        for k in range(indptr[current], indptr[current + 1]):
+            neighbor = indices[k]
+            nd = d + weights[k]
+            if nd < dist[neighbor]:
+                dist[neighbor] = nd
+                parent[neighbor] = current
+                heappush(heap, (nd + heuristic(neighbor, goal) if heuristic else nd, neighbor))
+    return SearchResult(None, float('inf'), expanded)
+
+
+def shortest_distances(graph, source):
+    """Weighted distance from source to every node (inf where unreachable)."""
+    indptr, indices, weights = graph.adjacency()
+    result = np.full(graph.n, np.inf)
+    dist = memoryview(result)
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, current = heappop(heap)
+        if d > dist[current]:
+            continue
+        for k in range(indptr[current], indptr[current + 1]):
+            neighbor = indices[k]
+            nd = d + weights[k]
+            if nd < dist[neighbor]:
+                dist[neighbor] = nd
+                heappush(heap, (nd, neighbor))
+    return result
@@ -0,0 +1,234 @@
+import json
+import struct
+
+# Every message travels as one frame: a 4-byte payload length and a 1-byte
+# type, then the payload.
+HEADER = struct.Struct("!IB")
+MAX_FRAME_SIZE = 1 << 20
+RECV_BUFFER_SIZE = 64 * 1024
+
+# Frame types, server to client. A keyframe carries the whole room; a delta
+# only what changed since the previous message; text is shown as is.
+KEYFRAME = 1
+DELTA = 2
+TEXT = 3
+# Client to server: the player's name, one move (W, A, S or D), leaving.
+NAME = 4
+MOVE = 5
+EXIT = 6
+
+# Ticks between keyframes. Deltas in between are relative to the previous
+# message, so a client that missed something is back in sync by the next one.
+KEYFRAME_INTERVAL = 40
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def pack_frame(frame_type, payload=b""):
+    return HEADER.pack(len(payload), frame_type) + payload
+
+
+def encode(message):
+    """Frame for a message dict; its "t" key becomes the frame type."""
+    if message["t"] == TEXT:
+        payload = message["text"].encode()
+    else:
+        body = {key: value for key, value in message.items() if key != "t"}
+        payload = json.dumps(body, separators=(",", ":")).encode()
+    return pack_frame(message["t"], payload)
+
+
+def decode(frame_type, payload):
+    if frame_type == TEXT:
+        return text_message(str(payload, "utf-8"))
+    message = json.loads(bytes(payload))
+    message["t"] = frame_type
+    return message
+
+
+class FrameReader:
+    """Splits a byte stream into frames inside one reusable buffer.
+
+    Data is received straight into free() (with recv_into, or as an asyncio
+    BufferedProtocol buffer) and feed() yields each complete frame as
+    (type, memoryview of the payload) without copying it. A partial frame
+    stays where it is until the end of the buffer is reached; only then is
+    it moved to the front, or into a bigger buffer if it would not fit.
+    Payload views are only valid until the next call to free().
+    """
+
+    def __init__(self, size=RECV_BUFFER_SIZE):
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+
+    def free(self):
+        """Writable view of the unused end of the buffer."""
+        if self._end == len(self._buffer):
+            self._make_room()
+        return self._view[self._end:]
+
+    def _make_room(self):
+        pending = self._end - self._start
+        needed = HEADER.size
+        if pending >= HEADER.size:
+            needed += HEADER.unpack_from(self._buffer, self._start)[0]
+        if needed > len(self._buffer):
+            buffer = bytearray(max(needed, 2 * len(self._buffer)))
+            buffer[:pending] = self._view[self._start:self._end]
+            self._buffer, self._view = buffer, memoryview(buffer)
+        else:
+            self._view[:pending] = self._view[self._start:self._end]
+        self._start, self._end = 0, pending
+
+    def feed(self, nbytes):
+        """Account for nbytes written into free(); returns an iterator over the complete frames."""
+        self._end += nbytes
+        return self._frames()
+
+    def _frames(self):
+        while self._end - self._start >= HEADER.size:
+            length, frame_type = HEADER.unpack_from(self._buffer, self._start)
+            if length > MAX_FRAME_SIZE:
+                raise ProtocolError(f"frame of {length} bytes is larger than {MAX_FRAME_SIZE}")
+            begin = self._start + HEADER.size
+            if self._end - begin < length:
+                break
+            self._start = begin + length
+            yield frame_type, self._view[begin:self._start]
+        if self._start == self._end:
+            self._start = self._end = 0
+
+    def recv(self, sock):
+        """Blocking read from sock; returns the frames received, or None once the peer has closed."""
+        nbytes = sock.recv_into(self.free())
+        if not nbytes:
+            return None
+        return self.feed(nbytes)
+
+
+def text_message(text):
+    return {"t": TEXT, "text": text}
+
+
+class StateEncoder:
+    """Server side: turns a room's state into one keyframe or delta per tick.
+
+    frame() compares the state with what was last sent and returns only the
+    differences, or None if nothing changed, so a tick costs bytes in
+    proportion to what moved rather than to the size of the grid.
+    """
+
+    def __init__(self, grid_size, keyframe_interval=KEYFRAME_INTERVAL):
+        self.grid_size = grid_size
+        self.keyframe_interval = keyframe_interval
+        self._view = None
+        self._players = None
+        self._ghosts = None
+        self._time_left = None
+        self._last_keyframe = None
+
+    def frame(self, tick, time_left, view, ghosts, players, walls_in=None):
+        """Message for one recipient's view, or None if nothing in it changed.
+
+        view is the (top, left, rows, cols) window the recipient sees,
+        ghosts a list of (row, col) and players a dict of player number ->
+        (symbol, row, col), both limited to what is inside the view.
+        walls_in(view) lists the wall cells in a view; walls never move, so
+        it is only called for keyframes and when the view itself moves.
+        """
+        view = tuple(view)
+        ghosts = [tuple(ghost) for ghost in ghosts]
+        if self._last_keyframe is None or tick - self._last_keyframe >= self.keyframe_interval:
+            message = {"t": KEYFRAME, "tick": tick, "size": self.grid_size, "view": view,
+                       "time_left": time_left, "ghosts": ghosts,
+                       "players": {str(no): entry for no, entry in players.items()},
+                       "walls": walls_in(view) if walls_in else []}
+            self._last_keyframe = tick
+        else:
+            message = {"t": DELTA, "tick": tick}
+            previous = self._players
+            # a player new to this view needs its symbol; otherwise the position is enough
+            moves = {str(no): entry if no not in previous else entry[1:]
+                     for no, entry in players.items() if previous.get(no) != entry}
+            gone = [no for no in previous if no not in players]
+            if view != self._view:
+                message["view"] = view
+                if walls_in:
+                    message["walls"] = walls_in(view)
+            if moves:
+                message["moves"] = moves
+            if gone:
+                message["gone"] = gone
+            if ghosts != self._ghosts:
+                message["ghosts"] = ghosts
+            if time_left != self._time_left:
+                message["time_left"] = time_left
+            if len(message) == 2:
+                return None
+        self._view = view
+        self._players = dict(players)
+        self._ghosts = ghosts
+        self._time_left = time_left
+        return message
+
+
+class WorldView:
+    """Client side: the part of the room this client sees, rebuilt from keyframes and deltas."""
+
+    def __init__(self):
+        self.size = 0
+        self.view = (0, 0, 0, 0)
+        self.time_left = None
+        self.ghosts = []
+        self.players = {}
+        self.walls = []
+        self.synced = False
+
+    def apply(self, message):
+        if message["t"] == KEYFRAME:
+            self.size = message["size"]
+            self.view = tuple(message["view"])
+            self.time_left = message["time_left"]
+            self.ghosts = [tuple(ghost) for ghost in message["ghosts"]]
+            self.players = {int(no): tuple(entry) for no, entry in message["players"].items()}
+            self.walls = message.get("walls", [])
+            self.synced = True
+        elif message["t"] == DELTA and self.synced:
+            if "view" in message:
+                self.view = tuple(message["view"])
+            if "walls" in message:
+                self.walls = message["walls"]
+            for no, entry in message.get("moves", {}).items():
+                no = int(no)
+                if len(entry) == 2:
+                    entry = (self.players[no][0] if no in self.players else "?", *entry)
+                self.players[no] = tuple(entry)
+            for no in message.get("gone", ()):
+                self.players.pop(no, None)
+            if "ghosts" in message:
+                self.ghosts = [tuple(ghost) for ghost in message["ghosts"]]
+            if "time_left" in message:
+                self.time_left = message["time_left"]
+
+    def generate_grid(self):
+        top, left, rows, cols = self.view
+        grid = [["." for _ in range(cols)] for _ in range(rows)]
+        for row, col in self.walls:
+            grid[row - top][col - left] = "#"
+        for symbol, row, col in self.players.values():
+            grid[row - top][col - left] = symbol
+        for row, col in self.ghosts:
+            grid[row - top][col - left] = "G"
+        return grid
+
+    def render(self):
+        if self.time_left > 0:
+            timer_str = f"\nTime left: {self.time_left} seconds\n"
+        else:
+            timer_str = "\nTime's up!\n"
+        grid_str = "\n".join([" ".join(row) for row in self.generate_grid()]) + "\n"
+        return timer_str + grid_str
@@ -0,0 +1,141 @@
+import time
+
+import matplotlib.pyplot as plt
+import networkx as nx
+
+# Redraws requested within one frame of the previous one are coalesced and
+# drawn when the frame is due, so bursts of updates cost a single blit.
+FRAME_BUDGET = 1 / 60
+
+DIFFICULTY_NAMES = {1: 'Easy', 2: 'Medium', 3: 'Hard', 4: 'Nightmare'}
+
+# Status lines above the map: slot -> (height in axes coordinates, colour).
+STATUS_SLOTS = {
+    'encounter': (1.01, 'red'),
+    'status': (1.03, 'blue'),
+    'died': (1.03, 'red'),
+    'hunt_over': (1.03, 'green'),
+    'hunt': (1.05, 'red'),
+    'powerup': (1.07, 'blue'),
+}
+
+
+class GameRenderer:
+    """Retained-mode view of a game.
+
+    The map (edges, nodes, labels, edge weights) is drawn once and cached as
+    the blitting background. Each update only moves the player and ghost
+    markers and rewrites the text, then blits them over the cached
+    background, so a move costs the same on a 24-node map as on a large one.
+    The background is recaptured on every full draw, e.g. after a resize.
+    """
+
+    def __init__(self, game, fig=None):
+        self.game = game
+        self.fig = fig if fig is not None else plt.gcf()
+        self.fig.clf()
+        self.ax = ax = self.fig.gca()
+        G, pos = game.G, game.pos
+
+        nx.draw_networkx_edges(G, pos, ax=ax, edge_color='gray', width=1, alpha=0.5)
+        nx.draw_networkx_nodes(G, pos, ax=ax, node_color='white', node_size=500, edgecolors='gray')
+        nx.draw_networkx_labels(G, pos, {i: str(i+1) for i in G.nodes()}, ax=ax)
+        if game.difficulty == 3:
+            edge_labels = {e: f'{w:.2f}' for e, w in nx.get_edge_attributes(G, 'weight').items()}
+            nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, ax=ax, font_size=8, font_color='blue')
+        ax.set_title(f'Ghost Game - {DIFFICULTY_NAMES[game.difficulty]} Mode')
+        ax.axis('off')
+
+        start = pos[game.player_position-1]
+        self.player = ax.scatter([start[0]], [start[1]], s=700, c='green', marker='o',
+                                 label='Player', zorder=3, animated=True)
+        self.player_label = ax.text(start[0], start[1], '', ha='center', va='center',
+                                    zorder=4, animated=True)
+        self.ghost = ax.scatter([start[0]], [start[1]], s=700, c='red', marker='h',
+                                label='Ghost', zorder=3, animated=True)
+        self.ghost_label = ax.text(start[0], start[1], '', ha='center', va='center',
+                                   zorder=4, animated=True)
+        self.sanity_text = ax.text(0.02, 0.004, '', transform=ax.transAxes, va='top', animated=True)
+        self.score_text = ax.text(0.02, 0.057, '', transform=ax.transAxes, va='top', animated=True)
+        self.status = {slot: ax.text(0.5, y, '', transform=ax.transAxes, ha='center', fontsize=12,
+                                     color=color, animated=True)
+                       for slot, (y, color) in STATUS_SLOTS.items()}
+        self._animated = [self.player, self.ghost, self.player_label, self.ghost_label,
+                          self.sanity_text, self.score_text, *self.status.values()]
+
+        self._background = None
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+        self._last_frame = 0.0
+        self._frame_pending = False
+        self._timer = self.fig.canvas.new_timer()
+        self._timer.single_shot = True
+        self._timer.add_callback(self._frame)
+        self._sync()
+
+    def _on_draw(self, event):
+        canvas = self.fig.canvas
+        if getattr(canvas, 'supports_blit', False):
+            self._background = canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self._animated:
+            self.fig.draw_artist(artist)
+
+    def _sync(self):
+        game = self.game
+        for marker, label, position in ((self.player, self.player_label, game.player_position),
+                                        (self.ghost, self.ghost_label, game.ghost_position)):
+            x, y = game.pos[position-1]
+            marker.set_offsets([[x, y]])
+            label.set_position((x, y))
+            label.set_text(str(position))
+        self.sanity_text.set_text(f'Sanity: {game.sanity}')
+        self.score_text.set_text(f'Current Score: {game.current_score}')
+
+    def set_status(self, slot, text):
+        self.status[slot].set_text(text)
+
+    def clear_status(self):
+        for text in self.status.values():
+            text.set_text('')
+
+    def request_frame(self):
+        """Schedule an update within the frame budget.
+
+        Draws straight away if the last frame is older than the budget,
+        otherwise arms a one-shot GUI timer for when it is due. Nothing is
+        scheduled while idle, so an idle game does not wake up at all.
+        """
+        if self._frame_pending:
+            return
+        wait = self._last_frame + FRAME_BUDGET - time.perf_counter()
+        if wait <= 0:
+            self._frame()
+        else:
+            self._frame_pending = True
+            self._timer.interval = max(1, int(wait * 1000))
+            self._timer.start()
+
+    def flush(self):
+        """Draw now rather than when the next frame is due, e.g. before the window closes."""
+        if self._frame_pending:
+            self._timer.stop()
+        self._frame()
+
+    def _frame(self):
+        self._frame_pending = False
+        self._last_frame = time.perf_counter()
+        self.update()
+
+    def update(self):
+        """Bring the markers and text up to date and blit them onto the cached map."""
+        self._sync()
+        canvas = self.fig.canvas
+        if self._background is None:
+            canvas.draw_idle()
+        else:
+            canvas.restore_region(self._background)
+            self._draw_animated()
+            canvas.blit(self.fig.bbox)
+        canvas.flush_events()
@@ -0,0 +1,120 @@
+import os
+import struct
+
+import numpy as np
+
+from mapgen import generate_map
+
+# One turn of a game, as stored in memory and in replay files (little-endian
+# whatever the machine, so files can be read anywhere). Record t is turn t.
+# respawned marks a turn the player was caught on and respawned after, so
+# the next turn starts from the respawn position rather than next to this one.
+RECORD = np.dtype([('turn', '<u4'), ('player', '<u4'), ('ghost', '<u4'), ('sanity', '<i4'),
+                   ('score', '<i4'), ('hearts_of_dead', '<u2'), ('ghost_hunt', 'u1'),
+                   ('hunt_duration', 'u1'), ('respawned', 'u1')])
+
+# Replay file header: magic, format version, record size, then what is needed
+# to rebuild the map (seed, size, radius), the difficulty and the player's name.
+# The records follow straight after it, so the file size gives their number.
+MAGIC = b'GHRP'
+VERSION = 2
+HEADER = struct.Struct('<4sHHQIdB3x32s')
+
+REPLAY_DIR = os.environ.get('GHOST_GAME_REPLAYS', 'replays')
+
+
+class History:
+    """Turn-by-turn record of one game in a preallocated structured array.
+
+    Each append() writes one RECORD row; the array doubles in size when it
+    fills up, so a game costs 25 bytes per turn and no objects per turn.
+    """
+
+    def __init__(self, capacity=256):
+        self._records = np.zeros(capacity, dtype=RECORD)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, key):
+        return self.records[key]
+
+    @property
+    def records(self):
+        """View of the turns recorded so far; fields are read as columns, e.g. records['player']."""
+        return self._records[:self._count]
+
+    def clear(self):
+        self._count = 0
+
+    def append(self, turn, player, ghost, sanity, score, hearts_of_dead, ghost_hunt, hunt_duration):
+        if self._count == len(self._records):
+            grown = np.zeros(2 * len(self._records), dtype=RECORD)
+            grown[:self._count] = self._records
+            self._records = grown
+        self._records[self._count] = (turn, player, ghost, sanity, score, hearts_of_dead, ghost_hunt,
+                                      hunt_duration, False)
+        self._count += 1
+
+    def mark_respawned(self):
+        """Flag the latest turn as one the player respawned after."""
+        self._records[self._count - 1]['respawned'] = True
+
+
+def write_replay(path, history, map_seed, map_size, map_radius, difficulty, player_name=''):
+    """Save history as a replay file at path."""
+    header = HEADER.pack(MAGIC, VERSION, RECORD.itemsize, map_seed, map_size, map_radius, difficulty,
+                         player_name.encode()[:32])
+    with open(path, 'wb') as out:
+        out.write(header)
+        out.write(history.records.tobytes())
+
+
+class Replay:
+    """A replay file, memory-mapped.
+
+    replay[turn] reads one record straight from the file, at the offset
+    given by the header and record sizes, so seeking to any turn costs the
+    same however long the game was, and opening a replay reads only its
+    header. Usable as a context manager, which closes the mapping.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"{path} is too short to be a replay")
+        magic, version, record_size, self.map_seed, self.map_size, self.map_radius, self.difficulty, name = \
+            HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a replay file")
+        if version != VERSION or record_size != RECORD.itemsize:
+            raise ValueError(f"{path} is replay version {version}, this reads version {VERSION}")
+        self.path = path
+        self.player_name = name.rstrip(b'\0').decode(errors='replace')
+        count = (os.path.getsize(path) - HEADER.size) // RECORD.itemsize
+        if count:
+            self.records = np.memmap(path, dtype=RECORD, mode='r', offset=HEADER.size, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, key):
+        return self.records[key]
+
+    def map(self):
+        """(positions, CSRGraph) of the map the game was played on."""
+        return generate_map(self.map_size, self.map_radius, self.map_seed)
+
+    def close(self):
+        """Drop the mapping; it is unmapped once no record read from it is still referenced."""
+        self.records = np.zeros(0, dtype=RECORD)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
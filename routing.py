@@ -0,0 +1,80 @@
+from collections import deque
+from heapq import heappush, heappop
+
+import numpy as np
+
+
+class RoutingTable:
+    """All-pairs routing tables for a fixed game map.
+
+    Holds hop-count and weighted distance matrices together with the matching
+    next-hop matrices, so once the table is built every distance or
+    "which way should the ghost step" query is a single array lookup.
+    Built from a CSRGraph. Unreachable pairs have hops -1, dist inf and
+    next hop -1. Memory is O(n^2), so this is meant for maps up to a few
+    thousand nodes; larger maps search the CSR graph directly.
+    """
+
+    def __init__(self, graph):
+        n = graph.n
+        indptr = graph.indptr.tolist()
+        indices = graph.indices.tolist()
+        weights = graph.weights.tolist()
+        adjacency = [list(zip(indices[indptr[u]:indptr[u + 1]], weights[indptr[u]:indptr[u + 1]]))
+                     for u in range(n)]
+
+        self.n = n
+        self.hops = np.full((n, n), -1, dtype=np.int32)
+        self.hop_next = np.full((n, n), -1, dtype=np.int32)
+        self.dist = np.full((n, n), np.inf, dtype=np.float64)
+        self.weighted_next = np.full((n, n), -1, dtype=np.int32)
+
+        # The map is undirected, so the search tree grown from a target gives,
+        # for every source, its parent on a shortest path: the next hop
+        # from that source towards the target.
+        for target in range(n):
+            self._fill_hops(adjacency, target)
+            self._fill_weighted(adjacency, target)
+
+    def _fill_hops(self, adjacency, target):
+        hops = self.hops[:, target]
+        parent = self.hop_next[:, target]
+        hops[target] = 0
+        parent[target] = target
+        queue = deque([target])
+        while queue:
+            current = queue.popleft()
+            for neighbor, _ in adjacency[current]:
+                if hops[neighbor] < 0:
+                    hops[neighbor] = hops[current] + 1
+                    parent[neighbor] = current
+                    queue.append(neighbor)
+
+    def _fill_weighted(self, adjacency, target):
+        dist = self.dist[:, target]
+        parent = self.weighted_next[:, target]
+        dist[target] = 0.0
+        parent[target] = target
+        heap = [(0.0, target)]
+        while heap:
+            d, current = heappop(heap)
+            if d > dist[current]:
+                continue
+            for neighbor, w in adjacency[current]:
+                nd = d + w
+                if nd < dist[neighbor]:
+                    dist[neighbor] = nd
+                    parent[neighbor] = current
+                    heappush(heap, (nd, neighbor))
+
+    def hop_distance(self, source, target):
+        d = self.hops[source, target]
+        return float('inf') if d < 0 else int(d)
+
+    def weighted_distance(self, source, target):
+        return float(self.dist[source, target])
+
+    def next_hop(self, source, target, weighted=False):
+        table = self.weighted_next if weighted else self.hop_next
+        step = table[source, target]
+        return source if step < 0 else int(step)
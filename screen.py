@@ -0,0 +1,153 @@
+import os
+import shutil
+import sys
+import threading
+
+CLEAR = "\x1b[2J\x1b[H"
+SAVE_CURSOR = "\x1b7"
+RESTORE_CURSOR = "\x1b8"
+ERASE_LINE = "\x1b[2K"
+RESET_SCROLL_REGION = "\x1b[r"
+
+# Unchanged cells between two changed runs that are rewritten rather than
+# skipped, since a cursor move costs about as many bytes.
+_MERGE_GAP = 4
+
+
+def _move(row, col):
+    return f"\x1b[{row + 1};{col + 1}H"
+
+
+def _scroll_region(top, bottom):
+    return f"\x1b[{top + 1};{bottom + 1}r"
+
+
+class TerminalScreen:
+    """Redraws only the cells that changed since the previous frame.
+
+    draw() takes the whole frame as text and compares it, row by row, with
+    the frame on screen; each run of changed cells becomes one cursor move
+    and the new characters. A frame is sent with a single write. The
+    terminal size is checked on every frame and a resize triggers a full
+    redraw. With size given (and e.g. an io.StringIO as out) the screen
+    runs headless.
+
+    The frame keeps to a scroll region above the bottom line, which holds
+    the input prompt, so typing a move and pressing Enter never scrolls the
+    frame. Anything else written to the terminal goes through write() or
+    prompt(), which make the next draw() repaint every row.
+    """
+
+    def __init__(self, out=None, size=None):
+        self.out = out if out is not None else sys.stdout
+        self.fixed_size = size
+        self.size = None
+        self._rows = []
+        self._prompt = ""
+        self._notice = ""
+        self._lock = threading.Lock()
+        if out is None and os.name == "nt":
+            # turns on ANSI escape handling in the Windows console
+            os.system("")
+
+    def terminal_size(self):
+        if self.fixed_size is not None:
+            return self.fixed_size
+        columns, lines = shutil.get_terminal_size()
+        return columns, lines
+
+    def invalidate(self):
+        """Forget what is on screen; the next draw clears it and repaints everything."""
+        with self._lock:
+            self.size = None
+            self._rows = []
+
+    def write(self, text):
+        """Show text that is not part of the frame: printed, or on the bottom line once a frame is up.
+
+        On the bottom line it stays in front of the next prompt.
+        """
+        with self._lock:
+            if self.size is None:
+                data = text + "\n"
+            else:
+                self._notice = " ".join(text.split("\n")) + "  "
+                data = self._bottom_line(self._notice)
+                self._rows = []
+            self.out.write(data)
+            self.out.flush()
+
+    def prompt(self, text):
+        """input(), with the prompt on the bottom line under the frame."""
+        with self._lock:
+            self._prompt = text
+            if self.size is None:
+                data = text
+            else:
+                data = self._bottom_line(self._notice + text)
+                self._notice = ""
+                # the echoed Enter may still upset a terminal that ignores the scroll region
+                self._rows = []
+            self.out.write(data)
+            self.out.flush()
+        return input()
+
+    def _bottom_line(self, text):
+        # the bottom line is outside the scroll region, so even a long line cannot scroll the frame
+        return _move(self.size[1] - 1, 0) + ERASE_LINE + text[:self.size[0] - 1]
+
+    def close(self):
+        """Give the whole terminal back, leaving the cursor on the bottom line."""
+        with self._lock:
+            if self.size is not None:
+                self.out.write(RESET_SCROLL_REGION + _move(self.size[1] - 1, 0) + "\n")
+                self.out.flush()
+            self.size = None
+            self._rows = []
+
+    def draw(self, text):
+        with self._lock:
+            return self._draw(text)
+
+    def _draw(self, text):
+        width, height = self.terminal_size()
+        # leave the bottom line for the input prompt
+        frame_height = max(1, height - 1)
+        rows = [line[:width].ljust(width) for line in text.split("\n")[:frame_height]]
+        if (width, height) != self.size:
+            self.size = (width, height)
+            parts = [CLEAR, _scroll_region(0, frame_height - 1), _move(0, 0),
+                     "\n".join(row.rstrip() for row in rows), _move(height - 1, 0), self._prompt]
+        elif not self._rows:
+            # something else wrote to the terminal: rewrite every row of the frame, leaving the prompt be
+            parts = [SAVE_CURSOR]
+            for y in range(frame_height):
+                parts.append(_move(y, 0) + (rows[y] if y < len(rows) else ERASE_LINE))
+            parts.append(RESTORE_CURSOR)
+        else:
+            parts = [SAVE_CURSOR]
+            blank = " " * width
+            old_rows = self._rows
+            for y in range(max(len(rows), len(old_rows))):
+                old = old_rows[y] if y < len(old_rows) else blank
+                new = rows[y] if y < len(rows) else blank
+                if old != new:
+                    self._diff_row(parts, y, old, new)
+            if len(parts) == 1:
+                return 0
+            parts.append(RESTORE_CURSOR)
+        self._rows = rows
+        data = "".join(parts)
+        self.out.write(data)
+        self.out.flush()
+        return len(data)
+
+    def _diff_row(self, parts, y, old, new):
+        changed = [x for x in range(len(new)) if old[x] != new[x]]
+        start = end = changed[0]
+        for x in changed[1:]:
+            if x - end > _MERGE_GAP:
+                parts.append(_move(y, start) + new[start:end + 1])
+                start = x
+            end = x
+        parts.append(_move(y, start) + new[start:end + 1])
@@ -1,171 +1,471 @@
-import socket
-import threading
+import argparse
+import asyncio
 import time
 import uuid
 import re
 
+from metrics import Metrics
+from protocol import (EXIT, MOVE, NAME, FrameReader, ProtocolError, StateEncoder, encode,
+                      text_message)
+from world import WorldState
+
+HOST = "192.168.131.2"
+PORT = 5555
+# Metrics are served on this port of the loopback interface only; 0 turns them off.
+METRICS_PORT = 9100
+# Pending connections the kernel queues while the loop is busy; a burst of
+# clients larger than this would see its handshakes dropped.
+BACKLOG = 1024
+
+PLAYERS_PER_ROOM = 3
+GRID_SIZE = 16
+GHOST_START = [1, 1]
+GAME_DURATION = 60
+# Each client is sent the cells within this distance of its own position;
+# a grid no bigger than the window is sent whole, once for everybody.
+VIEW_RADIUS = 12
+GHOSTS_PER_ROOM = 1
+# Share of cells that are walls; the original open grid has none.
+WALL_DENSITY = 0.0
+# Ghosts farther than this from every player head straight for the nearest
+# one instead of following the distance field, which caps its cost on big grids.
+FIELD_HORIZON = 64
+
+# Rooms advance in fixed steps on the monotonic clock; everything that
+# happens in a game (ghost moves, time left) is counted in ticks.
+TICK_RATE = 20
+TICK_INTERVAL = 1 / TICK_RATE
+# A room more than this many ticks behind gives up catching up and skips ahead.
+MAX_CATCHUP_TICKS = 5
+# Moves a client may make per second, and how many it may save up.
+MOVES_PER_SECOND = 10
+MOVE_BURST = 2
+
+# A client whose socket buffer grows past this is too slow to keep up and is dropped,
+# so one stalled connection never holds up the rest of its room.
+MAX_WRITE_BUFFER = 256 * 1024
+
 
 def get_mac_address():
     mac = uuid.getnode()
     mac_address = ':'.join(re.findall('..', '%012x' % mac))
     return mac_address
 
-def start_server():
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.bind(("192.168.131.2", 5555))
-    server.listen(3)  
-    print("Server started. Waiting for players...")
 
-    connections = []
-    player_names = []
-    lobby = []
-    survival_times = {}  
-    game_start_time = time.time()
-    game_over = False
-    ghost_speed = 1.0  
+class Player:
+    def __init__(self, player_no, name, transport, metrics):
+        self.player_no = player_no
+        self.name = name
+        self.symbol = name[0].upper() if name else f"P{player_no}"
+        self.transport = transport
+        self.metrics = metrics
+        self._send_seconds = metrics.histogram("send_seconds")
+        self.outbox = []
+        self.mac_addr = get_mac_address()
+        self.slot = None
+        self.encoder = None
+        self.caught = False
+        self.connected = True
+        self.move_tokens = MOVE_BURST
+        self.dropped_moves = 0
+
+    def send(self, data):
+        """Queue a frame; flush() writes everything queued with a single write."""
+        if self.connected:
+            self.outbox.append(data)
+
+    def flush(self):
+        if not self.outbox:
+            return
+        data, self.outbox = b"".join(self.outbox), []
+        transport = self.transport
+        if transport.is_closing() or transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            if not transport.is_closing():
+                self.metrics.inc("slow_client_drops_total")
+            self.disconnect()
+            return
+        started = time.perf_counter()
+        transport.write(data)
+        self._send_seconds.observe(time.perf_counter() - started)
+        self.metrics.inc("bytes_sent_total", len(data))
+
+    def disconnect(self):
+        if self.connected:
+            self.connected = False
+            self.outbox = []
+            # close() still sends whatever was already written
+            self.transport.close()
+
+
+class TickScheduler:
+    """Calls step(tick) every interval seconds on the monotonic clock.
+
+    Each sleep is measured to the next tick's deadline rather than for a
+    whole interval, so the time step() takes is made up for instead of
+    adding drift. A step that finishes past the next deadline counts as an
+    overrun; the scheduler then runs the late ticks back to back, and if it
+    falls more than max_catchup ticks behind it skips the missed ticks and
+    counts them. Skipped ticks still advance tick, from which the rooms tell
+    game time, so a round lasts as long on the clock however loaded the
+    server is. The catch-up ticks that follow are late too, but belong to
+    the same overrun and are not counted again.
+    """
+
+    def __init__(self, interval, max_catchup=MAX_CATCHUP_TICKS, metrics=None):
+        self.interval = interval
+        self.max_catchup = max_catchup
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.tick = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.worst_lateness = 0.0
 
-    
-    def display_lobby():
+    async def run(self, step):
+        """Run until step returns False."""
+        tick_seconds = self.metrics.histogram("tick_seconds")
+        deadline = time.monotonic()
+        catching_up = False
+        while True:
+            started = time.monotonic()
+            more = step(self.tick)
+            now = time.monotonic()
+            tick_seconds.observe(now - started)
+            if more is False:
+                break
+            self.tick += 1
+            deadline += self.interval
+            lateness = now - deadline
+            if lateness <= 0:
+                catching_up = False
+                await asyncio.sleep(-lateness)
+                continue
+            if not catching_up:
+                self.overruns += 1
+                self.metrics.inc("tick_overruns_total")
+                catching_up = True
+            self.worst_lateness = max(self.worst_lateness, lateness)
+            behind = int(lateness / self.interval)
+            if behind > self.max_catchup:
+                self.skipped += behind
+                self.metrics.inc("ticks_skipped_total", behind)
+                self.tick += behind
+                deadline += behind * self.interval
+            # let the connections run before the next tick either way
+            await asyncio.sleep(0)
+
+
+class Room:
+    """One match: a lobby that fills up to PLAYERS_PER_ROOM, then a game run by its own tick task."""
+
+    def __init__(self, room_id, grid_size=GRID_SIZE, capacity=PLAYERS_PER_ROOM, view_radius=VIEW_RADIUS,
+                 ghosts=GHOSTS_PER_ROOM, wall_density=WALL_DENSITY, metrics=None):
+        self.room_id = room_id
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.capacity = capacity
+        self.view_radius = view_radius
+        self.players = []
+        self.world = WorldState(grid_size, capacity, GHOST_START, ghosts, wall_density, FIELD_HORIZON)
+        self.ghost_speed = 1.0
+        # rooms that fill up together would otherwise all move their ghosts on the
+        # same tick; spreading the first move over a second spreads the work too
+        self.ghost_timer = (room_id % TICK_RATE) * TICK_INTERVAL
+        self.survival_times = {}
+        self.game_over = False
+        self.task = None
+        self.scheduler = TickScheduler(TICK_INTERVAL, metrics=self.metrics)
+        # latest move per player, applied at the next tick
+        self.pending_moves = {}
+        self.by_slot = []
+        self.shared_view = 2 * view_radius + 1 >= grid_size
+        self.encoder = StateEncoder(grid_size)
+
+    @property
+    def full(self):
+        return len(self.players) >= self.capacity
+
+    @property
+    def started(self):
+        return self.task is not None
+
+    def broadcast(self, message):
+        """Queue message for every player, serialised once for all of them."""
+        data = encode(message)
+        for player in self.players:
+            player.send(data)
+
+    def flush(self):
+        for player in self.players:
+            player.flush()
+
+    def display_lobby(self):
         lobby_table = "\nPlayer No | Player Name | MAC Addr           | Name in Game\n"
         lobby_table += "-" * 60 + "\n"
-        for entry in lobby:
-            lobby_table += f"{entry['player_no']}          | {entry['player_name']}       | {entry['mac_addr']} | {entry['name_in_game']}\n"
+        for player in self.players:
+            lobby_table += f"{player.player_no}          | {player.name}       | {player.mac_addr} | {player.symbol}\n"
         return lobby_table
 
-    for i in range(3):
-        conn, addr = server.accept()
-        print(f"Player {i+1} connected: {addr}")
-
-        mac_addr = get_mac_address()
-
-        conn.sendall("Enter your name: ".encode())
-        name = conn.recv(1024).decode().strip()
-        player_symbol = name[0].upper() if name else f"P{i+1}"  
-        player_names.append(name)
-        connections.append(conn)
-
-        lobby.append({
-            "player_no": i + 1,
-            "player_name": name,
-            "mac_addr": mac_addr,
-            "name_in_game": player_symbol
-        })
-        survival_times[name] = 0 
-        conn.sendall(f"Welcome, {name}! Waiting for other players...\n".encode())
-        conn.sendall(display_lobby().encode())
-
-    grid_size = 16
-    player_positions = [[15, 15], [15, 0], [0, 15]]  
-    ghost_position = [1, 1]
-    caught_players = set()
-    
-    def generate_grid():
-        grid = [["." for _ in range(grid_size)] for _ in range(grid_size)]
-        for i, pos in enumerate(player_positions):
-            if player_names[i] not in caught_players:  
-                grid[pos[0]][pos[1]] = lobby[i]['name_in_game']
-        grid[ghost_position[0]][ghost_position[1]] = "G"
-        return grid
-    
-    def send_grid_and_timer():
-        grid = generate_grid()
-        grid_str = "\n".join([" ".join(row) for row in grid]) + "\n"
-        elapsed_time = time.time() - game_start_time
-        time_left = 60 - int(elapsed_time)
-        
-        if time_left > 0:
-            timer_str = f"\nTime left: {time_left} seconds\n"
-        else:
-            timer_str = "\nTime's up!\n"
-
-        message = timer_str + grid_str
-        for conn in connections:
-            if conn not in caught_players:
-                conn.sendall(message.encode())
-    
-
-    def move_ghost():
-        active_positions = [player_positions[i] for i in range(3) if player_names[i] not in caught_players]
-        if not active_positions:
+    def join(self, name, transport):
+        player = Player(len(self.players) + 1, name, transport, self.metrics)
+        self.players.append(player)
+        self.survival_times[name] = 0
+        player.send(encode(text_message(f"Welcome, {name}! Waiting for other players...\n")))
+        player.send(encode(text_message(self.display_lobby())))
+        player.flush()
+        if self.full:
+            self.task = asyncio.create_task(self.run())
+        return player
+
+    def leave(self, player):
+        player.disconnect()
+        if player.slot is None:
+            # not placed in the world yet: the room is still filling up, or is full
+            # but run() has not started the game, so the player simply drops out
+            if player not in self.players:
+                return
+            self.players.remove(player)
+            self.survival_times.pop(player.name, None)
+            for i, other in enumerate(self.players):
+                other.player_no = i + 1
+        elif not player.caught:
+            # a player who quits is out of the game, like one who was caught
+            self.mark_out(player)
+
+    def mark_out(self, player):
+        player.caught = True
+        if player.slot is not None:
+            self.world.remove_player(player.slot)
+        self.pending_moves.pop(player, None)
+        self.survival_times[player.name] = self.scheduler.tick // TICK_RATE
+
+    def active_players(self):
+        return [player for player in self.players if not player.caught]
+
+    def view_of(self, bounds):
+        world = self.world
+        slots, ghosts = world.visible(bounds)
+        players = {}
+        for slot in slots.tolist():
+            player = self.by_slot[slot]
+            players[player.player_no] = (player.symbol, *world.positions[slot].tolist())
+        return world.ghosts[ghosts].tolist(), players
+
+    def send_state(self, tick):
+        """Send each player what changed in its view: one shared message, or one per viewport."""
+        time_left = GAME_DURATION - tick // TICK_RATE
+        world = self.world
+        if self.shared_view:
+            bounds = (0, 0, world.size, world.size)
+            message = self.encoder.frame(tick, time_left, bounds, *self.view_of(bounds), world.walls_in)
+            if message is not None:
+                self.broadcast(message)
             return
-        
-        for _ in range(2):  
-            distances = [abs(ghost_position[0] - p[0]) + abs(ghost_position[1] - p[1]) for p in active_positions]
-            target = active_positions[distances.index(min(distances))]
-
-            if ghost_position[0] < target[0]:
-                ghost_position[0] += 1
-            elif ghost_position[0] > target[0]:
-                ghost_position[0] -= 1
-            if ghost_position[1] < target[1]:
-                ghost_position[1] += 1
-            elif ghost_position[1] > target[1]:
-                ghost_position[1] -= 1
-    
-    def game_loop():
-        nonlocal game_over, ghost_speed
-        while not game_over:
-            move_ghost()
-            send_grid_and_timer()
-            
-            for i, pos in enumerate(player_positions):
-                if player_names[i] not in caught_players and pos == ghost_position:
-                    caught_players.add(player_names[i])
-                    survival_times[player_names[i]] = int(time.time() - game_start_time)
-                    for conn in connections:
-                        conn.sendall(f"{player_names[i]} was caught by the ghost! Ghost speed doubled!\n".encode())
-                    ghost_speed /= 1.25  
-            
-            if len(caught_players) == 3 or time.time() - game_start_time >= 60:
-                game_over = True
-                break
-            
-            time.sleep(ghost_speed)
+        for player in self.players:
+            if not player.connected:
+                continue
+            bounds = world.view_bounds(world.positions[player.slot], self.view_radius)
+            message = player.encoder.frame(tick, time_left, bounds, *self.view_of(bounds), world.walls_in)
+            if message is not None:
+                player.send(encode(message))
+
+    def queue_move(self, player, move):
+        """Remember the move for the next tick; a newer move replaces one not yet applied."""
+        if player.caught or not self.started or self.game_over:
+            return
+        if move in ("W", "A", "S", "D"):
+            self.pending_moves[player] = move
+
+    def apply_moves(self):
+        refill = MOVES_PER_SECOND / TICK_RATE
+        for player in self.players:
+            player.move_tokens = min(MOVE_BURST, player.move_tokens + refill)
+        moves, self.pending_moves = self.pending_moves, {}
+        for player in sorted(moves, key=lambda p: p.player_no):
+            if player.move_tokens < 1:
+                player.dropped_moves += 1
+                self.metrics.inc("moves_dropped_total")
+                continue
+            player.move_tokens -= 1
+            self.apply_move(player, moves[player])
+            self.metrics.inc("moves_applied_total")
+
+    def apply_move(self, player, move):
+        self.world.move_player(player.slot, move)
+
+    def step(self, tick):
+        """Advance the game by one tick and send what changed; returns False once it is over."""
+        self.apply_moves()
+
+        self.ghost_timer += TICK_INTERVAL
+        if self.ghost_timer >= self.ghost_speed:
+            self.ghost_timer -= self.ghost_speed
+            self.world.chase()
+
+        for slot in self.world.catches().tolist():
+            player = self.by_slot[slot]
+            self.mark_out(player)
+            self.metrics.inc("catches_total")
+            self.broadcast(text_message(f"{player.name} was caught by the ghost! Ghost speed doubled!\n"))
+            self.ghost_speed /= 1.25
 
-        for player in player_names:
-            if player not in caught_players:
-                survival_times[player] = 60
-        leaderboard = sorted(survival_times.items(), key=lambda x: x[1], reverse=True)
+        self.send_state(tick)
+        self.flush()
+
+        if not self.world.active.any() or tick + 1 >= GAME_DURATION * TICK_RATE:
+            self.game_over = True
+            return False
+
+    async def run(self):
+        print(f"Room {self.room_id}: game started with {', '.join(p.name for p in self.players)}")
+        world = self.world
+        for slot, (player, start) in enumerate(zip(self.players, world.spawn_positions(len(self.players)))):
+            player.slot = slot
+            player.encoder = None if self.shared_view else StateEncoder(world.size)
+            world.add_player(slot, start)
+        self.by_slot = list(self.players)
+        await self.scheduler.run(self.step)
+        scheduler = self.scheduler
+        if scheduler.overruns:
+            print(f"Room {self.room_id}: {scheduler.overruns} tick overruns "
+                  f"(worst {scheduler.worst_lateness * 1000:.1f} ms late, {scheduler.skipped} ticks skipped)")
+
+        for player in self.active_players():
+            self.survival_times[player.name] = GAME_DURATION
+        leaderboard = sorted(self.survival_times.items(), key=lambda x: x[1], reverse=True)
 
         final_message = "\nGame Over! Final Leaderboard:\n"
         final_message += "Player Name | Survival Time (s)\n"
         final_message += "-" * 30 + "\n"
         for name, time_spent in leaderboard:
             final_message += f"{name}       | {time_spent}\n"
-        for conn in connections:
-            conn.sendall(final_message.encode())
-    
-    
-    def handle_player_input(player_id, conn):
-        while not game_over:
-            try:
-                move = conn.recv(1024).decode().strip().upper()
-                if player_names[player_id] in caught_players:
-                    continue
-                if move == "W" and player_positions[player_id][0] > 0:
-                    player_positions[player_id][0] -= 1
-                elif move == "S" and player_positions[player_id][0] < grid_size - 1:
-                    player_positions[player_id][0] += 1
-                elif move == "A" and player_positions[player_id][1] > 0:
-                    player_positions[player_id][1] -= 1
-                elif move == "D" and player_positions[player_id][1] < grid_size - 1:
-                    player_positions[player_id][1] += 1
-                elif move == "EXIT":
-                    conn.sendall("You disconnected from the game.\n".encode())
-                    break
-            except Exception:
-                break
+        self.broadcast(text_message(final_message))
+        self.flush()
+        for player in self.players:
+            player.disconnect()
+        print(f"Room {self.room_id}: game over")
+
+
+class GameServer:
+    """Accepts any number of clients and seats them in rooms, all on one event loop.
+
+    Each new client joins the room that is still filling up; once it is
+    full the room's game starts as its own task and the next client opens
+    a new room.
+    """
 
-    threading.Thread(target=game_loop, daemon=True).start()
-    for i, conn in enumerate(connections):
-        threading.Thread(target=handle_player_input, args=(i, conn), daemon=True).start()
+    def __init__(self, grid_size=GRID_SIZE, players_per_room=PLAYERS_PER_ROOM, view_radius=VIEW_RADIUS,
+                 ghosts=GHOSTS_PER_ROOM, wall_density=WALL_DENSITY, metrics=None):
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.grid_size = grid_size
+        self.players_per_room = players_per_room
+        self.view_radius = view_radius
+        self.ghosts = ghosts
+        self.wall_density = wall_density
+        self.rooms = {}
+        self.lobby = None
+        self._next_room_id = 1
+        self.metrics.gauge("rooms", lambda: len(self.rooms))
+        self.metrics.gauge("rooms_running", lambda: sum(room.started for room in self.rooms.values()))
+        self.metrics.gauge("players_connected", lambda: sum(1 for player in self.players() if player.connected))
+        self.metrics.gauge("pending_moves", lambda: sum(len(room.pending_moves) for room in self.rooms.values()))
+        self.metrics.gauge("write_buffer_bytes", lambda: sum(self._write_buffers()))
+        self.metrics.gauge("write_buffer_bytes_max", lambda: max(self._write_buffers(), default=0))
 
-    while not game_over:
-        time.sleep(1)
+    def players(self):
+        for room in self.rooms.values():
+            yield from room.players
+
+    def _write_buffers(self):
+        return [player.transport.get_write_buffer_size() for player in self.players() if player.connected]
+
+    def open_room(self):
+        if self.lobby is None or self.lobby.full or self.lobby.started:
+            self.lobby = Room(self._next_room_id, self.grid_size, self.players_per_room, self.view_radius,
+                              self.ghosts, self.wall_density, self.metrics)
+            self.rooms[self.lobby.room_id] = self.lobby
+            self._next_room_id += 1
+        return self.lobby
+
+    def seat(self, name, transport):
+        room = self.open_room()
+        player = room.join(name, transport)
+        if room.started:
+            room.task.add_done_callback(lambda task: self.rooms.pop(room.room_id, None))
+        return room, player
+
+
+class ClientConnection(asyncio.BufferedProtocol):
+    """One client socket. Frames are received straight into a FrameReader buffer."""
+
+    def __init__(self, server):
+        self.server = server
+        self.frames = FrameReader()
+        self.transport = None
+        self.addr = None
+        self.room = None
+        self.player = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.addr = transport.get_extra_info("peername")
+        self.server.metrics.inc("connections_total")
+        print(f"Player connected: {self.addr}")
+        transport.write(encode(text_message("Enter your name: ")))
+
+    def get_buffer(self, sizehint):
+        return self.frames.free()
+
+    def buffer_updated(self, nbytes):
+        self.server.metrics.inc("bytes_received_total", nbytes)
+        try:
+            for frame_type, payload in self.frames.feed(nbytes):
+                self.handle_frame(frame_type, payload)
+        except (ProtocolError, UnicodeDecodeError) as err:
+            print(f"Dropping {self.addr}: {err}")
+            self.server.metrics.inc("protocol_errors_total")
+            self.transport.close()
+
+    def handle_frame(self, frame_type, payload):
+        if self.player is None:
+            if frame_type == NAME:
+                name = str(payload, "utf-8").strip()
+                self.room, self.player = self.server.seat(name, self.transport)
+        elif frame_type == MOVE and len(payload) == 1:
+            self.room.queue_move(self.player, chr(payload[0]).upper())
+        elif frame_type == EXIT:
+            self.player.send(encode(text_message("You disconnected from the game.\n")))
+            self.player.flush()
+            self.room.leave(self.player)
+
+    def connection_lost(self, exc):
+        self.server.metrics.inc("disconnects_total")
+        if self.player is not None and not self.room.game_over:
+            self.room.leave(self.player)
+        print(f"Player disconnected: {self.addr}")
+
+
+async def start_server(host=HOST, port=PORT, metrics_port=METRICS_PORT, **room_options):
+    game_server = GameServer(**room_options)
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(lambda: ClientConnection(game_server), host, port, backlog=BACKLOG)
+    if metrics_port:
+        await game_server.metrics.serve("127.0.0.1", metrics_port)
+        print(f"Metrics at http://127.0.0.1:{metrics_port}/")
+    print("Server started. Waiting for players...")
+    async with server:
+        await server.serve_forever()
 
-    for conn in connections:
-        conn.close()
-    server.close()
 
 if __name__ == "__main__":
-    start_server()
+    parser = argparse.ArgumentParser(description="Multiplayer ghost game server")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE)
+    parser.add_argument("--players", type=int, default=PLAYERS_PER_ROOM, help="players per room")
+    parser.add_argument("--view-radius", type=int, default=VIEW_RADIUS)
+    parser.add_argument("--ghosts", type=int, default=GHOSTS_PER_ROOM, help="ghosts per room")
+    parser.add_argument("--walls", type=float, default=WALL_DENSITY, help="share of cells that are walls")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="0 turns the metrics endpoint off")
+    args = parser.parse_args()
+    asyncio.run(start_server(args.host, args.port, args.metrics_port, grid_size=args.grid_size,
+                             players_per_room=args.players, view_radius=args.view_radius,
+                             ghosts=args.ghosts, wall_density=args.walls))
@@ -0,0 +1,308 @@
+import atexit
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+STAT_COLUMNS = ('games_played', 'total_score', 'best_score', 'hearts_of_dead')
+
+MYSQL_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "Ansh!2005",
+    "port": 3306,
+    "database": "ghost_game",
+}
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_stats (
+    player_name VARCHAR(50) PRIMARY KEY,
+    games_played INT DEFAULT 0,
+    total_score INT DEFAULT 0,
+    best_score INT DEFAULT 0,
+    hearts_of_dead INT DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_best_score ON user_stats (best_score, player_name);
+CREATE INDEX IF NOT EXISTS idx_total_score ON user_stats (total_score, player_name);
+"""
+
+
+def default_stats():
+    return {column: 0 for column in STAT_COLUMNS}
+
+
+class ConnectionPool:
+    """Keeps up to size open connections and hands them out again instead of reconnecting.
+
+    A caller that finds no idle connection waits for one that warm() is
+    still opening rather than opening another.
+    """
+
+    def __init__(self, connect, size=4):
+        self._connect = connect
+        self._size = size
+        self._created = 0
+        self._warming = 0
+        self._idle = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def _acquire(self):
+        with self._changed:
+            while not self._idle:
+                if not self._warming and self._created < self._size:
+                    self._created += 1
+                    break
+                self._changed.wait()
+            else:
+                return self._idle.pop()
+        try:
+            return self._connect()
+        except Exception:
+            self._forget()
+            raise
+
+    def _release(self, conn):
+        with self._changed:
+            self._idle.append(conn)
+            self._changed.notify()
+
+    def _forget(self):
+        with self._changed:
+            self._created -= 1
+            self._changed.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        except Exception:
+            # the connection may be broken; drop it rather than hand it out again
+            self._forget()
+            try:
+                conn.close()
+            except Exception:
+                pass
+            raise
+        else:
+            self._release(conn)
+
+    def warm(self):
+        """Open the first connection on a background thread so nobody waits on it later."""
+        with self._changed:
+            if self._created >= self._size:
+                return
+            self._created += 1
+            self._warming += 1
+
+        def open_one():
+            conn = None
+            try:
+                conn = self._connect()
+            except Exception as err:
+                print(f"Could not connect to the stats database: {err}")
+            with self._changed:
+                self._warming -= 1
+                if conn is None:
+                    self._created -= 1
+                else:
+                    self._idle.append(conn)
+                self._changed.notify_all()
+
+        threading.Thread(target=open_one, daemon=True).start()
+
+    def close(self):
+        with self._changed:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class MySQLBackend:
+    placeholder = '%s'
+    insert_ignore = "INSERT IGNORE INTO user_stats (player_name) VALUES (%s)"
+    greatest = 'GREATEST'
+
+    def __init__(self, pool_size=4, **config):
+        import mysql.connector
+
+        self.Error = mysql.connector.Error
+        config = {**MYSQL_CONFIG, **config}
+        self.pool = ConnectionPool(lambda: mysql.connector.connect(**config), pool_size)
+
+
+class SQLiteBackend:
+    """Local stand-in for the MySQL server, with the same user_stats table."""
+
+    placeholder = '?'
+    insert_ignore = "INSERT OR IGNORE INTO user_stats (player_name) VALUES (?)"
+    greatest = 'MAX'
+    Error = sqlite3.Error
+
+    def __init__(self, path='ghost_game.db', pool_size=4):
+        self.path = path
+
+        def connect():
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.executescript(SQLITE_SCHEMA)
+            return conn
+
+        self.pool = ConnectionPool(connect, pool_size)
+
+
+def backend_from_env():
+    """SQLite if $GHOST_GAME_DB is sqlite:<path>, otherwise the MySQL server."""
+    url = os.environ.get('GHOST_GAME_DB', '')
+    if url.startswith('sqlite:'):
+        return SQLiteBackend(url[len('sqlite:'):] or 'ghost_game.db')
+    return MySQLBackend()
+
+
+class StatsStore:
+    """Cached, write-behind access to the user_stats table.
+
+    load() serves each player's row from memory after the first read.
+    update() applies a change to the cached row at once and queues it;
+    a background thread writes the queue in batches every flush_interval
+    seconds, and again at shutdown. Counters are written as atomic
+    increments and best_score as a max, so several game processes can
+    share a table without overwriting each other.
+    """
+
+    def __init__(self, backend, flush_interval=2.0):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self._cache = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._listeners = []
+        backend.pool.warm()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def load(self, player_name):
+        with self._lock:
+            if player_name in self._cache:
+                return dict(self._cache[player_name])
+        row = default_stats()
+        try:
+            with self.backend.pool.connection() as db:
+                cursor = db.cursor()
+                try:
+                    cursor.execute(
+                        f"SELECT {', '.join(STAT_COLUMNS)} FROM user_stats WHERE player_name = {self.backend.placeholder}",
+                        (player_name,))
+                    result = cursor.fetchone()
+                finally:
+                    cursor.close()
+            if result:
+                row = dict(zip(STAT_COLUMNS, result))
+            else:
+                # the row itself is inserted by the next flush
+                with self._lock:
+                    self._queue(player_name, {})
+        except self.backend.Error as err:
+            print(f"Error loading stats: {err}")
+        with self._lock:
+            self._cache.setdefault(player_name, row)
+            return dict(self._cache[player_name])
+
+    def update(self, player_name, games_played=0, total_score=0, best_score=None, hearts_of_dead=None):
+        """Add to the counters, raise best_score, set hearts_of_dead; returns the new cached row."""
+        with self._lock:
+            row = self._cache.setdefault(player_name, default_stats())
+            row['games_played'] += games_played
+            row['total_score'] += total_score
+            if best_score is not None:
+                row['best_score'] = max(row['best_score'], best_score)
+            if hearts_of_dead is not None:
+                row['hearts_of_dead'] = hearts_of_dead
+            self._queue(player_name, {'games_played': games_played, 'total_score': total_score,
+                                      'best_score': best_score, 'hearts_of_dead': hearts_of_dead})
+            return dict(row)
+
+    def _queue(self, player_name, change, older=False):
+        # caller holds self._lock; older marks a change made before what is already
+        # pending (a failed batch), whose absolute fields must not overwrite it
+        pending = self._pending.setdefault(player_name, {'games_played': 0, 'total_score': 0,
+                                                         'best_score': None, 'hearts_of_dead': None})
+        pending['games_played'] += change.get('games_played', 0)
+        pending['total_score'] += change.get('total_score', 0)
+        if change.get('best_score') is not None:
+            pending['best_score'] = max(pending['best_score'] or 0, change['best_score'])
+        if change.get('hearts_of_dead') is not None and not (older and pending['hearts_of_dead'] is not None):
+            pending['hearts_of_dead'] = change['hearts_of_dead']
+
+    def add_commit_listener(self, listener):
+        """Call listener(player_names) after every batch that reaches the database."""
+        self._listeners.append(listener)
+
+    def flush_soon(self):
+        """Wake the background writer instead of waiting for the next interval."""
+        self._wake.set()
+
+    def flush(self):
+        """Write every queued change in one batch and commit."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return
+            p = self.backend.placeholder
+            update = (f"UPDATE user_stats SET games_played = games_played + {p}, "
+                      f"total_score = total_score + {p}, "
+                      f"best_score = {self.backend.greatest}(best_score, COALESCE({p}, best_score)), "
+                      f"hearts_of_dead = COALESCE({p}, hearts_of_dead) "
+                      f"WHERE player_name = {p}")
+            try:
+                with self.backend.pool.connection() as db:
+                    cursor = db.cursor()
+                    try:
+                        cursor.executemany(self.backend.insert_ignore, [(name,) for name in batch])
+                        cursor.executemany(update, [
+                            (c['games_played'], c['total_score'], c['best_score'], c['hearts_of_dead'], name)
+                            for name, c in batch.items()])
+                        db.commit()
+                    finally:
+                        cursor.close()
+            except self.backend.Error as err:
+                print(f"Error saving stats: {err}")
+                # keep the changes for the next attempt, merged with anything queued since
+                with self._lock:
+                    for name, change in batch.items():
+                        self._queue(name, change, older=True)
+                return
+            for listener in self._listeners:
+                listener(set(batch))
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the background writer and flush whatever is still queued."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._worker.join(timeout=self.flush_interval + 1)
+        self.flush()
+        self.backend.pool.close()
+
+
+_store = None
+
+
+def get_store():
+    """Process-wide store for the backend chosen by $GHOST_GAME_DB."""
+    global _store
+    if _store is None:
+        _store = StatsStore(backend_from_env())
+    return _store
@@ -0,0 +1,163 @@
+import numpy as np
+
+from engine import DIFFICULTIES, ROUTING_TABLE_MAX_NODES, RULES
+from mapgen import generate_map
+from routing import RoutingTable
+
+# Columns of the observation array, one row per game. Nodes are numbered
+# from 0 here, and distance is the player's distance to the ghost in hops.
+OBS_FIELDS = ('player', 'ghost', 'sanity', 'score', 'hearts_of_dead', 'ghost_hunt', 'distance')
+
+
+class VecGameEnv:
+    """n copies of the single-player game on one map, stepped together.
+
+    Follows the same rules as GameEngine, but every piece of state is an
+    array with one entry per game and a turn is a handful of array
+    operations for all of them. The ghost's moves and the distances
+    come from the map's routing tables: a hop-distance matrix and next-hop
+    matrices, built once. An action is an index into the player's
+    neighbour list (see action_mask()); an index with no neighbour behind it
+    leaves that game as it was. A caught player with a Heart of the Dead
+    always respawns, and a game that ends is started again straight away,
+    so every step returns a live observation for every game.
+    """
+
+    def __init__(self, graph, n_envs, difficulty=1, hearts_of_dead=0, seed=None, rules=RULES,
+                 difficulties=DIFFICULTIES, routes=None):
+        if difficulty == 4:
+            raise ValueError("the Nightmare ghost searches each game separately and cannot be vectorised")
+        if graph.n > ROUTING_TABLE_MAX_NODES and routes is None:
+            raise ValueError(f"maps above {ROUTING_TABLE_MAX_NODES} nodes are too large for the routing tables")
+        self.n_envs = n_envs
+        self.rules = rules
+        self.settings = difficulties[difficulty]
+        self.difficulty = difficulty
+        self.start_hearts = hearts_of_dead
+        self.rng = np.random.default_rng(seed)
+        # closed doors are neither walked through nor counted in hops, as in GameEngine
+        graph = graph.open_edges()
+        routes = routes if routes is not None else RoutingTable(graph)
+        n = graph.n
+        # unreachable pairs (-1) count as infinitely far
+        self.hops = np.where(routes.hops < 0, np.iinfo(np.int32).max, routes.hops).astype(np.int32)
+        # the same tables GameEngine uses on maps this size: fewest hops on Easy, weighted otherwise
+        next_hop = routes.hop_next if difficulty == 1 else routes.weighted_next
+        self.next_hop = np.where(next_hop < 0, np.arange(n)[:, None], next_hop).astype(np.int32)
+
+        degree = np.diff(graph.indptr)
+        self.max_degree = int(degree.max()) if n else 0
+        self.neighbors = np.full((n, self.max_degree), -1, dtype=np.int32)
+        for u in range(n):
+            self.neighbors[u, :degree[u]] = graph.indices[graph.indptr[u]:graph.indptr[u + 1]]
+
+        # spawn table: for every player node, the nodes far enough away for the ghost
+        far = self.hops >= rules.ghost_spawn_distance
+        none = ~far.any(axis=1)
+        far[none] = self.hops[none] == self.hops[none].max(axis=1, keepdims=True)
+        self.far_counts = far.sum(axis=1)
+        order = np.argsort(~far, axis=1, kind='stable')
+        self.far_nodes = order[:, :max(1, int(self.far_counts.max()))].astype(np.int32)
+
+        self.player = np.zeros(n_envs, dtype=np.int32)
+        self.ghost = np.zeros(n_envs, dtype=np.int32)
+        self.sanity = np.zeros(n_envs, dtype=np.int32)
+        self.score = np.zeros(n_envs, dtype=np.int32)
+        self.hearts_of_dead = np.zeros(n_envs, dtype=np.int32)
+        self.ghost_hunt = np.zeros(n_envs, dtype=bool)
+        self.hunt_duration = np.zeros(n_envs, dtype=np.int32)
+        self.ghost_move_counter = np.zeros(n_envs, dtype=np.int32)
+        self.turns = np.zeros(n_envs, dtype=np.int32)
+        self.n_nodes = n
+        self.reset()
+
+    @classmethod
+    def generate(cls, n_envs, map_size=24, map_radius=0.2, map_seed=None, **options):
+        """Environment on a freshly generated map; options as for the constructor."""
+        _, graph = generate_map(map_size, map_radius, map_seed)
+        return cls(graph, n_envs, **options)
+
+    def reset(self, games=None):
+        """Start the given games (a boolean mask, default all) afresh; returns the observation."""
+        games = np.ones(self.n_envs, dtype=bool) if games is None else games
+        count = int(games.sum())
+        if count:
+            self._spawn(games, count)
+            self.sanity[games] = self.settings.sanity
+            self.score[games] = 0
+            self.hearts_of_dead[games] = self.start_hearts
+            self.ghost_hunt[games] = False
+            self.hunt_duration[games] = 0
+            self.ghost_move_counter[games] = 0
+            self.turns[games] = 0
+        return self.observe()
+
+    def _spawn(self, games, count):
+        player = self.rng.integers(0, self.n_nodes, count, dtype=np.int32)
+        pick = (self.rng.random(count) * self.far_counts[player]).astype(np.int64)
+        self.player[games] = player
+        self.ghost[games] = self.far_nodes[player, pick]
+
+    def action_mask(self):
+        """(n_envs, max_degree) bool array of the actions that are real moves."""
+        return self.neighbors[self.player] >= 0
+
+    def observe(self):
+        distance = self.hops[self.player, self.ghost]
+        return np.stack([self.player, self.ghost, self.sanity, self.score, self.hearts_of_dead,
+                         self.ghost_hunt, distance], axis=1)
+
+    def step(self, actions):
+        """Play one turn in every game; returns (observation, reward, done, info).
+
+        reward is each game's score gained this turn and done marks the
+        games that ended (and were reset). info holds, per game, the final
+        'score' and 'turns' of the games that ended and whether they ended
+        'caught'; entries for games still running are 0 or False.
+        """
+        rules, settings, rng = self.rules, self.settings, self.rng
+        actions = np.asarray(actions)
+        in_range = (actions >= 0) & (actions < self.max_degree)
+        target = self.neighbors[self.player, np.where(in_range, actions, 0)]
+        moving = in_range & (target >= 0)
+        player = np.where(moving, target, self.player)
+        self.player = player
+
+        # power-ups: a booster tablet, else perhaps a Heart of the Dead
+        booster = rng.integers(1, 101, self.n_envs) <= rules.booster_chance
+        heart = ~booster & (rng.integers(1, 101, self.n_envs) <= rules.heart_chance)
+        self.sanity += np.where(moving & booster, rules.booster_sanity, 0)
+        self.hearts_of_dead += moving & heart
+
+        # the ghost: hunting, starting a hunt, or a calm step that happens by chance
+        hunting = moving & self.ghost_hunt
+        starting = moving & ~self.ghost_hunt & (self.ghost_move_counter >= rules.hunt_after)
+        calm = moving & ~self.ghost_hunt & ~starting
+        steps = hunting | (calm & (rng.random(self.n_envs) < settings.ghost_move_chance))
+        self.ghost = np.where(steps, self.next_hop[self.ghost, player], self.ghost)
+        self.hunt_duration -= hunting
+        over = hunting & (self.hunt_duration == 0)
+        low, high = rules.hunt_turns
+        self.hunt_duration = np.where(starting, rng.integers(low, high + 1, self.n_envs), self.hunt_duration)
+        self.ghost_hunt = (self.ghost_hunt & ~over) | starting
+        self.ghost_move_counter = np.where(over, 0, self.ghost_move_counter + calm)
+
+        distance = self.hops[player, self.ghost].astype(np.int64)
+        proximity = np.maximum(0, (rules.proximity_range - distance) * rules.proximity_penalty)
+        loss = settings.sanity_loss + proximity + np.where(self.ghost_hunt, rules.hunt_sanity_loss, 0)
+        self.sanity -= np.where(moving, loss, 0).astype(np.int32)
+        reward = np.where(moving, rules.move_score, 0).astype(np.int32)
+        self.score += reward
+        self.turns += moving
+
+        caught = moving & (player == self.ghost)
+        respawn = caught & (self.hearts_of_dead > 0)
+        count = int(respawn.sum())
+        if count:
+            self.hearts_of_dead -= respawn
+            self.sanity[respawn] = settings.respawn_sanity
+            self._spawn(respawn, count)
+        done = (caught & ~respawn) | (moving & ~caught & (self.sanity <= 0))
+        info = {'score': np.where(done, self.score, 0), 'turns': np.where(done, self.turns, 0),
+                'caught': done & caught}
+        return self.reset(done), reward, done, info
@@ -0,0 +1,162 @@
+import random
+
+import numpy as np
+
+from distance_field import DistanceField
+
+MAX_GRID_SIZE = 1024
+# Random cells looked at for each spawn beyond the corners.
+SPAWN_TRIES = 16
+
+# (row, col) step for each move key.
+MOVES = {"W": (-1, 0), "S": (1, 0), "A": (0, -1), "D": (0, 1)}
+
+
+class WorldState:
+    """Everything in one room, stored as arrays.
+
+    Player slot i is at positions[i] and is in the game while active[i];
+    occupancy counts the active players on every cell and walls marks the
+    cells nobody can enter. Ghosts are the rows of ghosts. Catches, ghost
+    moves and viewport queries work on all entities at once instead of
+    looping over players in Python.
+
+    Ghosts chase along a DistanceField seeded from every active player, so
+    each ghost only looks up its neighbours' distances, however many ghosts
+    there are. The field catches up with the players' moves when the
+    ghosts next move; a ghost beyond the field's horizon heads straight
+    for the nearest player instead.
+    """
+
+    def __init__(self, size, capacity, ghost_start, ghost_count=1, wall_density=0.0,
+                 horizon=None, rng=None):
+        if not 2 <= size <= MAX_GRID_SIZE:
+            raise ValueError(f"grid size must be between 2 and {MAX_GRID_SIZE}, not {size}")
+        self.size = size
+        self.capacity = capacity
+        self.rng = rng if rng is not None else random.Random()
+        self.positions = np.zeros((capacity, 2), dtype=np.int32)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.occupancy = np.zeros((size, size), dtype=np.uint8)
+        last = size - 1
+        self.corners = [(last, last), (last, 0), (0, last)]
+        self.walls = np.zeros((size, size), dtype=bool)
+        if wall_density > 0:
+            walls = np.random.default_rng(self.rng.randrange(2**32)).random((size, size)) < wall_density
+            for row, col in [tuple(ghost_start)] + self.corners:
+                walls[row, col] = False
+            self.walls = walls
+        # further ghosts go on distinct free cells, clear of the corners the players start on
+        free = ~self.walls
+        free[tuple(ghost_start)] = False
+        for row, col in self.corners[:capacity]:
+            free[row, col] = False
+        cells = np.flatnonzero(free).tolist()
+        extra = max(0, ghost_count - 1)
+        if extra > len(cells):
+            raise ValueError(f"{ghost_count} ghosts do not fit on a {size}x{size} grid "
+                             f"with {len(cells) + 1} free cells")
+        ghosts = [tuple(ghost_start)] + [divmod(cell, size) for cell in self.rng.sample(cells, extra)]
+        self.ghosts = np.array(ghosts, dtype=np.int32).reshape(-1, 2)
+        self.field = DistanceField(self.walls, horizon)
+
+    def random_free_cell(self):
+        while True:
+            cell = (self.rng.randrange(self.size), self.rng.randrange(self.size))
+            if not self.walls[cell]:
+                return cell
+
+    def spawn_positions(self, count, tries=SPAWN_TRIES):
+        """Corners first, as in the three-player game, then free cells away from the ghosts.
+
+        Each further spot is the candidate farthest from its nearest ghost
+        out of tries random free cells.
+        """
+        spots = self.corners[:count]
+        while len(spots) < count:
+            candidates = np.array([self.random_free_cell() for _ in range(tries)])
+            gaps = np.abs(candidates[:, None, :] - self.ghosts[None, :, :]).sum(axis=2).min(axis=1)
+            spots.append(tuple(candidates[gaps.argmax()].tolist()))
+        return spots
+
+    def add_player(self, slot, position):
+        self.positions[slot] = position
+        self.active[slot] = True
+        self.occupancy[position[0], position[1]] += 1
+
+    def remove_player(self, slot):
+        if self.active[slot]:
+            self.active[slot] = False
+            row, col = self.positions[slot]
+            self.occupancy[row, col] -= 1
+
+    def move_player(self, slot, move):
+        """Step player slot by move (W, A, S or D) unless a wall or the edge is in the way."""
+        row, col = self.positions[slot]
+        d_row, d_col = MOVES[move]
+        new_row, new_col = row + d_row, col + d_col
+        if not (0 <= new_row < self.size and 0 <= new_col < self.size) or self.walls[new_row, new_col]:
+            return False
+        self.occupancy[row, col] -= 1
+        self.occupancy[new_row, new_col] += 1
+        self.positions[slot] = (new_row, new_col)
+        return True
+
+    def nearest_targets(self):
+        """For each ghost, the slot of the closest active player by Manhattan distance, or -1."""
+        if not self.active.any():
+            return np.full(len(self.ghosts), -1)
+        distances = np.abs(self.ghosts[:, None, :] - self.positions[None, :, :]).sum(axis=2)
+        distances[:, ~self.active] = np.iinfo(np.int32).max
+        return distances.argmin(axis=1)
+
+    def chase(self, steps=2):
+        """Move every ghost steps times one cell (diagonals allowed) towards its nearest player."""
+        if not self.active.any():
+            return
+        slots = np.flatnonzero(self.active)
+        cells = self.positions[slots, 0].astype(np.int64) * self.size + self.positions[slots, 1]
+        self.field.update(dict(zip(slots.tolist(), cells.tolist())))
+        for _ in range(steps):
+            ghosts = self.ghosts
+            target, reached = self.field.next_cells(ghosts[:, 0].astype(np.int64) * self.size + ghosts[:, 1])
+            moved = np.stack(np.divmod(target, self.size), axis=1)
+            if not reached.all():
+                # out of the field's reach: straight at the nearest player, unless a wall is there
+                lost = ~reached
+                straight = ghosts[lost] + np.sign(self.positions[self.nearest_targets()[lost]] - ghosts[lost])
+                blocked = self.walls[straight[:, 0], straight[:, 1]]
+                moved[lost] = np.where(blocked[:, None], ghosts[lost], straight)
+            self.ghosts = moved.astype(np.int32)
+
+    def catches(self):
+        """Slots of active players standing on a ghost's cell."""
+        ghosts = self.ghosts
+        if not self.occupancy[ghosts[:, 0], ghosts[:, 1]].any():
+            return np.empty(0, dtype=np.intp)
+        hit = (self.positions[:, None, :] == ghosts[None, :, :]).all(axis=2).any(axis=1)
+        return np.flatnonzero(hit & self.active)
+
+    def view_bounds(self, center, radius):
+        """(top, left, rows, cols) of the window of the given radius around center, kept on the grid."""
+        span = min(2 * radius + 1, self.size)
+        top = min(max(center[0] - radius, 0), self.size - span)
+        left = min(max(center[1] - radius, 0), self.size - span)
+        return int(top), int(left), span, span
+
+    def walls_in(self, bounds):
+        """Wall cells inside bounds, as a list of (row, col)."""
+        top, left, rows, cols = bounds
+        return (np.argwhere(self.walls[top:top + rows, left:left + cols]) + (top, left)).tolist()
+
+    def visible(self, bounds):
+        """Active player slots and ghost indices inside bounds."""
+        top, left, rows, cols = bounds
+        slots = np.flatnonzero(self.active & _inside(self.positions, top, left, rows, cols))
+        ghosts = np.flatnonzero(_inside(self.ghosts, top, left, rows, cols))
+        return slots, ghosts
+
+
+def _inside(points, top, left, rows, cols):
+    return ((points[:, 0] >= top) & (points[:, 0] < top + rows)
+            & (points[:, 1] >= left) & (points[:, 1] < left + cols))